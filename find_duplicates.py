@@ -8,13 +8,46 @@ Usage:
 
 The priority file contains one directory per line, in order of preference.
 Hash files contain whitespace-separated "HASH PATH" pairs.
+
+With --external-sort (or --presorted for inputs already sorted by hash),
+duplicate groups are streamed from a disk-backed merge instead of being
+collected in memory, so hash files larger than RAM can be processed.
 """
 
 import argparse
+import hashlib
+import heapq
+import io
+import os
+import shutil
+import sqlite3
+import stat
+import subprocess
 import sys
+import tempfile
+from array import array
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Optional, Union
+
+try:
+    import blake3
+    HAS_BLAKE3 = True
+except ImportError:
+    HAS_BLAKE3 = False
+
+# Check for b3sum command-line utility
+HAS_B3SUM = shutil.which('b3sum') is not None
+
+SORT_RUN_LINES = 1_000_000  # Pairs sorted in memory per external-sort run
+MERGE_FAN_IN = 128  # Runs merged at once; more runs are merged in passes
+PARSE_RANGE_BYTES = 64 << 20  # Hash files are split into ranges of about this size for --jobs
+DB_BATCH_ROWS = 50_000  # Rows inserted per executemany() while ingesting into --db
+PARTIAL_HASH_BYTES = 4 << 10  # --scan: bytes hashed at each end of same-size files
+READ_BUFFER_SIZE = 1 << 20  # --scan: read buffer for full hashes
 
 
 def parse_priority_file(priority_path: Path) -> List[str]:
@@ -54,6 +87,23 @@ def parse_hash_file(hash_path: Path) -> List[Tuple[str, str]]:
     Returns:
         List of (hash, path) tuples
 
+    Raises:
+        FileNotFoundError: If hash file doesn't exist
+        ValueError: If hash file contains invalid lines
+    """
+    return list(iter_hash_file(hash_path))
+
+
+def iter_hash_file(hash_path: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Stream the "HASH PATH" pairs of a hash file without loading it.
+
+    Args:
+        hash_path: Path to file containing whitespace-separated hash-path pairs
+
+    Yields:
+        (hash, path) tuples in file order
+
     Raises:
         FileNotFoundError: If hash file doesn't exist
         ValueError: If hash file contains invalid lines
@@ -61,26 +111,118 @@ def parse_hash_file(hash_path: Path) -> List[Tuple[str, str]]:
     if not hash_path.exists():
         raise FileNotFoundError(f"Hash file not found: {hash_path}")
 
-    hash_path_pairs = []
-
     with open(hash_path, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
+        yield from _parse_lines(f, hash_path)
+
+
+def _parse_lines(lines: Iterable[str], hash_path: Path, first_line: int = 1
+                 ) -> Iterator[Tuple[str, str]]:
+    """Parse "HASH PATH" lines; first_line numbers the first one in errors."""
+    for line_num, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line:
+            continue
+
+        # Split on whitespace, expecting exactly 2 parts
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            raise ValueError(
+                f"Invalid format in {hash_path} at line {line_num}: "
+                f"expected 'HASH PATH', got: {line}"
+            )
+
+        yield parts[0], parts[1]
+
+
+def split_ranges(hash_path: Path, range_bytes: int = PARSE_RANGE_BYTES
+                 ) -> List[Tuple[int, int]]:
+    """
+    Split a file into (start, end) byte ranges that begin at line starts.
+
+    Args:
+        hash_path: File to split
+        range_bytes: Approximate size of each range
+
+    Returns:
+        Consecutive ranges covering the whole file
+    """
+    size = hash_path.stat().st_size
+    ranges = []
+    start = 0
+    with open(hash_path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + range_bytes, size))
+            f.readline()  # Move the boundary to the start of the next line
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _read_range(hash_path: Path, start: int, end: int) -> io.TextIOWrapper:
+    """Open a byte range as text, with the same newline handling as open()."""
+    with open(hash_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+
 
-            # Split on whitespace, expecting exactly 2 parts
-            parts = line.split(None, 1)
-            if len(parts) != 2:
-                raise ValueError(
-                    f"Invalid format in {hash_path} at line {line_num}: "
-                    f"expected 'HASH PATH', got: {line}"
-                )
+def _range_pairs(hash_path: Path, start: int, end: int) -> Iterator[Tuple[str, str]]:
+    """Parse the pairs in a byte range (line numbers in errors are range-relative)."""
+    return _parse_lines(_read_range(hash_path, start, end), hash_path)
 
-            hash_value, file_path = parts
-            hash_path_pairs.append((hash_value, file_path))
 
-    return hash_path_pairs
+def _raise_range_error(hash_path: Path, start: int, end: int) -> None:
+    """Re-parse a range that failed in a worker, numbering lines from the file start."""
+    with open(hash_path, 'rb') as f:
+        lines_before = f.read(start).count(b'\n')
+    for _ in _parse_lines(_read_range(hash_path, start, end), hash_path, lines_before + 1):
+        pass
+
+
+def _key64(hash_value: str) -> int:
+    """A process-independent 64-bit key for a hash string (unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(hash_value.encode('utf-8'), digest_size=8).digest(),
+                          'little')
+
+
+def _range_keys(hash_path: Path, start: int, end: int, partitions: int) -> List[array]:
+    """Worker for the first parallel pass: the keys of a range, one array('Q') per partition."""
+    keys = [array('Q') for _ in range(partitions)]
+    for hash_value, _ in _range_pairs(hash_path, start, end):
+        key = _key64(hash_value)
+        keys[key % partitions].append(key)
+    return keys
+
+
+def _repeated_keys(*key_arrays: array) -> array:
+    """Reduce worker: the keys of one partition that occur more than once."""
+    seen = set()
+    repeated = set()
+    for keys in key_arrays:
+        for key in keys:
+            if key in seen:
+                repeated.add(key)
+            else:
+                seen.add(key)
+    return array('Q', repeated)
+
+
+_candidate_keys: Set[int] = set()
+
+
+def _init_candidates(keys: Set[int]) -> None:
+    global _candidate_keys
+    _candidate_keys = keys
+
+
+def _range_candidates(hash_path: Path, start: int, end: int) -> Dict[str, List[str]]:
+    """Worker for the second parallel pass: paths of candidate hashes in a range."""
+    partial: Dict[str, List[str]] = {}
+    for hash_value, file_path in _range_pairs(hash_path, start, end):
+        if _key64(hash_value) in _candidate_keys:
+            partial.setdefault(hash_value, []).append(file_path)
+    return partial
 
 
 def collect_all_hashes(hash_files: List[Path]) -> Dict[str, List[str]]:
@@ -107,7 +249,333 @@ def collect_all_hashes(hash_files: List[Path]) -> Dict[str, List[str]]:
     return hash_to_paths
 
 
-def get_priority_index(path: str, priorities: List[str]) -> Optional[int]:
+class PriorityIndex:
+    """
+    Longest-prefix index over the priority directories.
+
+    A path matches a priority directory if it is that directory or lies
+    below it, so the candidates for a path are exactly its ancestors.
+    Walking the ancestors from the deepest up and probing a dict finds the
+    most specific match in O(depth), independent of the number of
+    priority directories.  Results are cached per parent directory, since
+    duplicate groups are dominated by files sharing a few directories.
+    """
+
+    def __init__(self, priorities: List[str]):
+        """
+        Args:
+            priorities: List of priority directories in order (highest first)
+        """
+        self.priorities = priorities
+        self._index: Dict[str, int] = {}
+        self._dir_cache: Dict[str, Optional[int]] = {}
+
+        for index, priority_dir in enumerate(priorities):
+            priority_normalized = priority_dir.rstrip('/')
+            # An empty directory ("/") never wins a longest match; a repeated
+            # directory keeps its first (highest priority) position
+            if priority_normalized and priority_normalized not in self._index:
+                self._index[priority_normalized] = index
+
+    def lookup(self, path: str) -> Optional[int]:
+        """
+        Determine the priority index for a given path.
+
+        Args:
+            path: File path to check
+
+        Returns:
+            Index of the most specific matching priority directory, or None
+        """
+        path_normalized = path.rstrip('/')
+        index = self._index.get(path_normalized)
+        if index is not None:
+            return index
+        return self._lookup_dir(path_normalized.rpartition('/')[0].rstrip('/'))
+
+    def _lookup_dir(self, directory: str) -> Optional[int]:
+        try:
+            return self._dir_cache[directory]
+        except KeyError:
+            pass
+
+        index = None
+        ancestor = directory
+        while ancestor:
+            index = self._index.get(ancestor)
+            if index is not None:
+                break
+            ancestor = ancestor.rpartition('/')[0].rstrip('/')
+
+        self._dir_cache[directory] = index
+        return index
+
+
+def _digest_key(hash_value: str) -> Union[bytes, str]:
+    """
+    Return the compact dictionary key for a hash: binary for lowercase hex.
+
+    Other spellings (uppercase hex, non-hex tokens) stay strings, so two
+    hashes group together exactly when their text is equal, as before.
+    """
+    try:
+        digest = bytes.fromhex(hash_value)
+    except ValueError:
+        return hash_value
+    return digest if digest.hex() == hash_value else hash_value
+
+
+def _key_hash(key: Union[bytes, str]) -> str:
+    """Inverse of _digest_key."""
+    return key.hex() if isinstance(key, bytes) else key
+
+
+def is_rereadable(hash_path: Path) -> bool:
+    """Whether a hash file can be read twice (a regular file, not a pipe)."""
+    try:
+        return stat.S_ISREG(hash_path.stat().st_mode)
+    except OSError:
+        return False
+
+
+def _serial_candidates(hash_files: List[Path]) -> Iterator[Tuple[str, str]]:
+    """Two serial passes: count hash() values, then yield pairs of repeated ones."""
+    seen: Set[int] = set()
+    repeated: Set[int] = set()
+
+    for hash_file in hash_files:
+        for hash_value, _ in iter_hash_file(hash_file):
+            h = hash(hash_value)
+            if h in seen:
+                repeated.add(h)
+            else:
+                seen.add(h)
+    del seen
+
+    for hash_file in hash_files:
+        for hash_value, file_path in iter_hash_file(hash_file):
+            if hash(hash_value) in repeated:
+                yield hash_value, file_path
+
+
+def _parallel_candidates(hash_files: List[Path], jobs: int,
+                         range_bytes: int = PARSE_RANGE_BYTES) -> Iterator[Tuple[str, str]]:
+    """
+    The two passes of _serial_candidates, spread over a process pool.
+
+    Files are split into byte ranges at line boundaries.  Workers turn
+    each range into 64-bit keys bucketed into one partition per worker;
+    the partitions are reduced to repeated keys in parallel, and a second
+    round of workers returns partial maps of the candidate pairs in each
+    range, merged here in range order so paths keep their input order.
+    """
+    for hash_file in hash_files:
+        if not hash_file.exists():
+            raise FileNotFoundError(f"Hash file not found: {hash_file}")
+    work = [(hash_file, start, end) for hash_file in hash_files
+            for start, end in split_ranges(hash_file, range_bytes)]
+    if not work:
+        return
+
+    def gather(futures: list) -> list:
+        results = []
+        for (hash_file, start, end), future in zip(work, futures):
+            try:
+                results.append(future.result())
+            except ValueError:
+                _raise_range_error(hash_file, start, end)
+                raise
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        partitioned = gather([pool.submit(_range_keys, *item, jobs) for item in work])
+        # Partition p of every range goes to the same reduce call
+        reduced = pool.map(_repeated_keys, *partitioned)
+        del partitioned
+        repeated = set()
+        for keys in reduced:
+            repeated.update(keys)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_candidates,
+                             initargs=(repeated,)) as pool:
+        partials = gather([pool.submit(_range_candidates, *item) for item in work])
+
+    for partial in partials:
+        for hash_value, paths in partial.items():
+            for file_path in paths:
+                yield hash_value, file_path
+
+
+def collect_duplicate_groups(hash_files: List[Path], jobs: int = 1
+                             ) -> Dict[Union[bytes, str], tuple]:
+    """
+    Collect only the hashes that occur at least twice, in compact form.
+
+    A first pass keeps just a 64-bit hash of every hash string, which is
+    enough to find candidates seen twice; collisions only admit extra
+    singletons, which are discarded later as before.  The second pass
+    materializes paths for candidates only, keyed by binary digest, with
+    each path split into an interned directory (stored as an index into a
+    shared table) and its file name.
+
+    Args:
+        hash_files: List of paths to regular hash files (each is read twice)
+        jobs: Number of worker processes parsing the files
+
+    Returns:
+        Dictionary mapping digest keys to (directory ids, names, directories)
+        groups; pass to iter_compact_groups to get (hash, paths) pairs
+    """
+    if jobs > 1:
+        candidates = _parallel_candidates(hash_files, jobs)
+    else:
+        candidates = _serial_candidates(hash_files)
+
+    try:
+        directories: List[str] = []
+        directory_ids: Dict[str, int] = {}
+        groups: Dict[Union[bytes, str], tuple] = {}
+        for hash_value, file_path in candidates:
+            key = _digest_key(hash_value)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (array('I'), [], directories)
+            # Directory keeps its trailing '/', so directory + name is the path
+            split = file_path.rfind('/') + 1
+            directory = file_path[:split]
+            directory_id = directory_ids.get(directory)
+            if directory_id is None:
+                directory_id = directory_ids[directory] = len(directories)
+                directories.append(directory)
+            group[0].append(directory_id)
+            group[1].append(file_path[split:])
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error processing hash files: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    return groups
+
+
+def iter_compact_groups(groups: Dict[Union[bytes, str], tuple]
+                        ) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Rebuild (hash, paths) pairs from collect_duplicate_groups, one group at a time.
+
+    Args:
+        groups: Result of collect_duplicate_groups
+
+    Yields:
+        (hash, paths) with paths in input order
+    """
+    for key, (directory_ids, names, directories) in groups.items():
+        yield _key_hash(key), [
+            directories[directory_id] + name
+            for directory_id, name in zip(directory_ids, names)
+        ]
+
+
+def _write_run(pairs: List[Tuple[str, str]], temp_dir: str) -> str:
+    """Write sorted pairs to a temporary run file and return its name."""
+    fd, name = tempfile.mkstemp(prefix='run-', dir=temp_dir)
+    with open(fd, 'w', encoding='utf-8') as f:
+        f.writelines(f"{hash_value} {file_path}\n" for hash_value, file_path in pairs)
+    return name
+
+
+def _read_run(name: str) -> Iterator[Tuple[str, str]]:
+    """Stream the pairs of a run file written by _write_run."""
+    with open(name, 'r', encoding='utf-8') as f:
+        for line in f:
+            hash_value, file_path = line.rstrip('\n').split(' ', 1)
+            yield hash_value, file_path
+
+
+def _check_sorted(pairs: Iterable[Tuple[str, str]], hash_path: Path
+                  ) -> Iterator[Tuple[str, str]]:
+    """Pass pairs through, raising ValueError if hashes are not in order."""
+    previous = ''
+    for hash_value, file_path in pairs:
+        if hash_value < previous:
+            raise ValueError(
+                f"{hash_path} is not sorted by hash: {hash_value} follows {previous}"
+            )
+        previous = hash_value
+        yield hash_value, file_path
+
+
+def iter_sorted_pairs(hash_files: List[Path], presorted: bool = False,
+                      run_lines: int = SORT_RUN_LINES,
+                      temp_dir: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Stream all hash-path pairs ordered by hash, using bounded memory.
+
+    Inputs are cut into runs of run_lines pairs, each sorted in memory and
+    spilled to a temporary file, and the runs are k-way merged (in several
+    passes if there are more than MERGE_FAN_IN).  Sorting and merging are
+    both stable, so paths sharing a hash keep their input order and the
+    first-encountered fallback of find_keeper_path is unchanged.
+
+    Args:
+        hash_files: List of paths to hash files
+        presorted: Inputs are already sorted by hash (e.g. by LC_ALL=C sort);
+            merge them directly without temporary files
+        run_lines: Pairs held in memory per sorted run
+        temp_dir: Directory for run files (default: the system temp directory)
+
+    Yields:
+        (hash, path) tuples ordered by hash
+
+    Raises:
+        FileNotFoundError: If a hash file doesn't exist
+        ValueError: If a hash file contains invalid lines, or is not sorted
+            when presorted is set
+    """
+    if presorted:
+        yield from heapq.merge(
+            *(_check_sorted(iter_hash_file(hash_path), hash_path) for hash_path in hash_files),
+            key=itemgetter(0)
+        )
+        return
+
+    with tempfile.TemporaryDirectory(prefix='find_duplicates-', dir=temp_dir) as work_dir:
+        runs = []
+        for hash_path in hash_files:
+            pairs = iter_hash_file(hash_path)
+            while chunk := list(islice(pairs, run_lines)):
+                chunk.sort(key=itemgetter(0))
+                runs.append(_write_run(chunk, work_dir))
+
+        # Merge passes keep the number of open run files bounded
+        while len(runs) > MERGE_FAN_IN:
+            merged = []
+            for start in range(0, len(runs), MERGE_FAN_IN):
+                batch = runs[start:start + MERGE_FAN_IN]
+                merged.append(_write_run(
+                    heapq.merge(*map(_read_run, batch), key=itemgetter(0)), work_dir))
+                for name in batch:
+                    os.unlink(name)
+            runs = merged
+
+        yield from heapq.merge(*map(_read_run, runs), key=itemgetter(0))
+
+
+def iter_hash_groups(sorted_pairs: Iterable[Tuple[str, str]]
+                     ) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Group hash-ordered pairs, holding only one group in memory at a time.
+
+    Args:
+        sorted_pairs: (hash, path) tuples ordered by hash
+
+    Yields:
+        (hash, paths) for every hash, in hash order
+    """
+    for hash_value, pairs in groupby(sorted_pairs, key=itemgetter(0)):
+        yield hash_value, [file_path for _, file_path in pairs]
+
+
+def get_priority_index(path: str,
+                       priorities: Union[List[str], PriorityIndex]) -> Optional[int]:
     """
     Determine the priority index for a given path.
 
@@ -116,48 +584,38 @@ def get_priority_index(path: str, priorities: List[str]) -> Optional[int]:
 
     Args:
         path: File path to check
-        priorities: List of priority directories in order
+        priorities: PriorityIndex, or list of priority directories in order
 
     Returns:
         Index of the matching priority directory (lower is higher priority),
         or None if path doesn't match any priority directory
     """
-    best_match_index = None
-    best_match_length = 0
+    if not isinstance(priorities, PriorityIndex):
+        priorities = PriorityIndex(priorities)
+    return priorities.lookup(path)
 
-    for index, priority_dir in enumerate(priorities):
-        # Check if path starts with priority directory
-        # Handle both with and without trailing slashes
-        priority_normalized = priority_dir.rstrip('/')
-        path_normalized = path.rstrip('/')
-
-        if path_normalized.startswith(priority_normalized + '/') or \
-           path_normalized == priority_normalized:
-            # Keep the longest (most specific) match
-            if len(priority_normalized) > best_match_length:
-                best_match_index = index
-                best_match_length = len(priority_normalized)
-
-    return best_match_index
 
-
-def find_keeper_path(paths: List[str], priorities: List[str]) -> str:
+def find_keeper_path(paths: List[str],
+                     priorities: Union[List[str], PriorityIndex]) -> str:
     """
     Determine which path to keep among duplicates based on priority.
 
     Args:
         paths: List of duplicate file paths
-        priorities: List of priority directories in order
+        priorities: PriorityIndex, or list of priority directories in order
 
     Returns:
         The path to keep (highest priority or first encountered)
     """
+    if not isinstance(priorities, PriorityIndex):
+        priorities = PriorityIndex(priorities)
+
     # Find paths with priority and their indices
     paths_with_priority = []
     paths_without_priority = []
 
     for path in paths:
-        priority_idx = get_priority_index(path, priorities)
+        priority_idx = priorities.lookup(path)
         if priority_idx is not None:
             paths_with_priority.append((priority_idx, path))
         else:
@@ -173,26 +631,24 @@ def find_keeper_path(paths: List[str], priorities: List[str]) -> str:
     return paths_without_priority[0] if paths_without_priority else paths[0]
 
 
-def find_duplicates_to_remove(
-    hash_to_paths: Dict[str, List[str]],
-    priorities: List[str]
-) -> List[str]:
+def iter_duplicates_to_remove(
+    groups: Iterable[Tuple[str, List[str]]],
+    priorities: Union[List[str], PriorityIndex]
+) -> Iterator[str]:
     """
-    Identify duplicate files to remove based on priority.
-
-    IMPORTANT: Only processes hashes with 2 or more files. Single files
-    are NEVER considered duplicates and will not be included in the output.
+    Yield the files to remove from each duplicate group as it arrives.
 
     Args:
-        hash_to_paths: Dictionary mapping hashes to file paths
-        priorities: List of priority directories in order
+        groups: (hash, paths) pairs, e.g. hash_to_paths.items() or iter_hash_groups()
+        priorities: PriorityIndex, or list of priority directories in order
 
-    Returns:
-        List of file paths to remove (sorted)
+    Yields:
+        File paths to remove, group by group
     """
-    paths_to_remove = []
+    if not isinstance(priorities, PriorityIndex):
+        priorities = PriorityIndex(priorities)
 
-    for hash_value, paths in hash_to_paths.items():
+    for hash_value, paths in groups:
         # Critical: Only process if there are actual duplicates (2+ files)
         # Single files must NEVER be reported as duplicates
         if len(paths) <= 1:
@@ -207,15 +663,62 @@ def find_duplicates_to_remove(
         # All other paths should be removed
         for path in paths:
             if path != keeper:
-                paths_to_remove.append(path)
+                yield path
 
+
+def iter_duplicates_to_keep(
+    groups: Iterable[Tuple[str, List[str]]],
+    priorities: Union[List[str], PriorityIndex]
+) -> Iterator[str]:
+    """
+    Yield the file to keep from each duplicate group as it arrives.
+
+    Args:
+        groups: (hash, paths) pairs, e.g. hash_to_paths.items() or iter_hash_groups()
+        priorities: PriorityIndex, or list of priority directories in order
+
+    Yields:
+        One file path to keep per duplicate set
+    """
+    if not isinstance(priorities, PriorityIndex):
+        priorities = PriorityIndex(priorities)
+
+    for hash_value, paths in groups:
+        # Critical: Only process if there are actual duplicates (2+ files)
+        # Single files must NEVER be reported as duplicates
+        if len(paths) <= 1:
+            continue
+
+        # Additional defensive check: ensure we actually have multiple paths
+        assert len(paths) >= 2, f"Logic error: processing hash {hash_value} with {len(paths)} path(s)"
+
+        yield find_keeper_path(paths, priorities)
+
+
+def find_duplicates_to_remove(
+    hash_to_paths: Dict[str, List[str]],
+    priorities: Union[List[str], PriorityIndex]
+) -> List[str]:
+    """
+    Identify duplicate files to remove based on priority.
+
+    IMPORTANT: Only processes hashes with 2 or more files. Single files
+    are NEVER considered duplicates and will not be included in the output.
+
+    Args:
+        hash_to_paths: Dictionary mapping hashes to file paths
+        priorities: PriorityIndex, or list of priority directories in order
+
+    Returns:
+        List of file paths to remove (sorted)
+    """
     # Sort for consistent output
-    return sorted(paths_to_remove)
+    return sorted(iter_duplicates_to_remove(hash_to_paths.items(), priorities))
 
 
 def find_duplicates_to_keep(
     hash_to_paths: Dict[str, List[str]],
-    priorities: List[str]
+    priorities: Union[List[str], PriorityIndex]
 ) -> List[str]:
     """
     Identify duplicate files to keep based on priority.
@@ -225,28 +728,411 @@ def find_duplicates_to_keep(
 
     Args:
         hash_to_paths: Dictionary mapping hashes to file paths
-        priorities: List of priority directories in order
+        priorities: PriorityIndex, or list of priority directories in order
 
     Returns:
         List of file paths to keep (sorted), one per duplicate set
     """
-    paths_to_keep = []
+    # Sort for consistent output
+    return sorted(iter_duplicates_to_keep(hash_to_paths.items(), priorities))
 
-    for hash_value, paths in hash_to_paths.items():
-        # Critical: Only process if there are actual duplicates (2+ files)
-        # Single files must NEVER be reported as duplicates
-        if len(paths) <= 1:
+
+class DedupDatabase:
+    """
+    Persistent SQLite index of hash files for incremental runs (--db).
+
+    Every (hash, path) pair is stored with the hash file it came from and
+    its line number; hash files are keyed by resolved path and remembered
+    with their size and mtime.  A run re-ingests only hash files whose
+    size or mtime changed (and drops those no longer given), collecting
+    the hashes they touched.  Only those hashes' groups are re-evaluated;
+    the keeper of every current duplicate group is stored, so a run can
+    report exactly which groups are new, changed keeper, changed members
+    or stopped being duplicates.
+
+    Changing the priority file or the order of hash files on the command
+    line (which decides keepers among unprioritized paths) re-evaluates
+    all stored groups, but still without reparsing unchanged files.
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        Open (or create) the database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = Path(db_path)
+        try:
+            self._db = sqlite3.connect(str(self.db_path))
+            self._db.executescript("""
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS sources (
+                    id       INTEGER PRIMARY KEY,
+                    path     TEXT UNIQUE NOT NULL,
+                    size     INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    hash      NOT NULL,
+                    path      TEXT NOT NULL,
+                    source_id INTEGER NOT NULL,
+                    line      INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+                CREATE INDEX IF NOT EXISTS entries_source ON entries (source_id);
+                CREATE TABLE IF NOT EXISTS groups (
+                    hash      PRIMARY KEY,
+                    keeper    TEXT NOT NULL,
+                    signature INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key   TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+        except sqlite3.Error as e:
+            print(f"Error opening database {self.db_path}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    def sync(self, hash_files: List[Path]) -> Tuple[Set[Union[bytes, str]], int]:
+        """
+        Bring the stored entries in line with the given hash files.
+
+        Args:
+            hash_files: Hash files of this run, in command-line order
+
+        Returns:
+            (digest keys whose entries changed, number of files re-ingested)
+
+        Raises:
+            FileNotFoundError: If a hash file doesn't exist
+            ValueError: If a changed hash file contains invalid lines
+        """
+        db = self._db
+        known = {path: (source_id, size, mtime_ns) for source_id, path, size, mtime_ns
+                 in db.execute("SELECT id, path, size, mtime_ns FROM sources")}
+        dirty: Set[Union[bytes, str]] = set()
+        ingested = 0
+        current = set()
+
+        with db:
+            for hash_file in hash_files:
+                if not hash_file.exists():
+                    raise FileNotFoundError(f"Hash file not found: {hash_file}")
+                st = hash_file.stat()
+                path = str(hash_file.resolve())
+                if path in current:
+                    # The same file given twice is ingested once
+                    continue
+                current.add(path)
+                source = known.get(path)
+                if source is not None and source[1:] == (st.st_size, st.st_mtime_ns):
+                    continue
+
+                if source is not None:
+                    # Keep the source id, so no entry can be left behind under a stale one
+                    source_id = source[0]
+                    dirty.update(self._drop_source(source_id))
+                    db.execute("UPDATE sources SET size = ?, mtime_ns = ? WHERE id = ?",
+                               (st.st_size, st.st_mtime_ns, source_id))
+                else:
+                    source_id = db.execute(
+                        "INSERT INTO sources (path, size, mtime_ns) VALUES (?, ?, ?)",
+                        (path, st.st_size, st.st_mtime_ns)
+                    ).lastrowid
+                rows = ((_digest_key(hash_value), file_path, source_id, line)
+                        for line, (hash_value, file_path) in enumerate(iter_hash_file(hash_file)))
+                while batch := list(islice(rows, DB_BATCH_ROWS)):
+                    db.executemany(
+                        "INSERT INTO entries (hash, path, source_id, line) VALUES (?, ?, ?, ?)",
+                        batch
+                    )
+                    dirty.update(row[0] for row in batch)
+                ingested += 1
+
+            for path, (source_id, _, _) in known.items():
+                if path not in current:
+                    dirty.update(self._drop_source(source_id))
+                    db.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+
+        return dirty, ingested
+
+    def _drop_source(self, source_id: int) -> Set[Union[bytes, str]]:
+        """Delete a source's entries, returning the hashes they had."""
+        hashes = {row[0] for row in self._db.execute(
+            "SELECT DISTINCT hash FROM entries WHERE source_id = ?", (source_id,))}
+        self._db.execute("DELETE FROM entries WHERE source_id = ?", (source_id,))
+        return hashes
+
+    def update_groups(self, dirty: Set[Union[bytes, str]], hash_files: List[Path],
+                      priorities: PriorityIndex) -> List[Tuple[str, str, str]]:
+        """
+        Re-evaluate the duplicate groups of the given hashes.
+
+        Args:
+            dirty: Digest keys returned by sync()
+            hash_files: Hash files of this run, in command-line order
+            priorities: Priority index of this run
+
+        Returns:
+            Sorted (status, hash, keeper) changes, status being 'new',
+            'keeper', 'members' or 'resolved' (keeper is '' when resolved)
+        """
+        db = self._db
+        order = {row[0]: row[1] for row in db.execute("SELECT id, path FROM sources")}
+        position: Dict[str, int] = {}
+        for hash_file in hash_files:
+            position.setdefault(str(hash_file.resolve()), len(position))
+        source_rank = {source_id: position.get(path, len(position))
+                       for source_id, path in order.items()}
+
+        settings = '\n'.join(priorities.priorities) + '\0' + '\n'.join(
+            sorted(position, key=position.get))
+        previous = db.execute("SELECT value FROM meta WHERE key = 'settings'").fetchone()
+
+        changes = []
+        upserts = []
+        with db:
+            # Dirty hashes and source ranks go into temp tables, so every
+            # affected entry comes back from one query, grouped by hash
+            db.execute("CREATE TEMP TABLE dirty (hash PRIMARY KEY)")
+            db.execute("CREATE TEMP TABLE source_rank (source_id INTEGER PRIMARY KEY, rank INTEGER)")
+            db.executemany("INSERT INTO temp.dirty (hash) VALUES (?)", ((key,) for key in dirty))
+            if previous is None or previous[0] != settings:
+                # Keepers depend on priorities and file order: revisit every group
+                db.execute("INSERT OR IGNORE INTO temp.dirty (hash) SELECT hash FROM groups")
+            db.executemany("INSERT INTO temp.source_rank (source_id, rank) VALUES (?, ?)",
+                           source_rank.items())
+
+            old_groups = {row[0]: row[1:] for row in db.execute(
+                "SELECT g.hash, g.keeper, g.signature FROM groups g"
+                " JOIN temp.dirty d ON d.hash = g.hash"
+            )}
+            rows = db.execute(
+                "SELECT e.hash, e.path FROM entries e"
+                " JOIN temp.dirty d ON d.hash = e.hash"
+                " JOIN temp.source_rank r ON r.source_id = e.source_id"
+                " ORDER BY e.hash, r.rank, e.line"
+            )
+            for key, group in groupby(rows, key=itemgetter(0)):
+                paths = [row[1] for row in group]
+                old = old_groups.pop(key, None)
+                if len(paths) <= 1:
+                    if old is not None:
+                        old_groups[key] = old  # Resolved, deleted below
+                    continue
+
+                keeper = find_keeper_path(paths, priorities)
+                signature = int.from_bytes(hashlib.blake2b(
+                    '\0'.join(sorted(paths)).encode('utf-8'), digest_size=8).digest(),
+                    'little', signed=True)
+                if old is None:
+                    status = 'new'
+                elif old[0] != keeper:
+                    status = 'keeper'
+                elif old[1] != signature:
+                    status = 'members'
+                else:
+                    continue
+                upserts.append((key, keeper, signature))
+                changes.append((status, _key_hash(key), keeper))
+
+            # Stored groups left over have at most one entry now
+            db.executemany("DELETE FROM groups WHERE hash = ?", ((key,) for key in old_groups))
+            changes.extend(('resolved', _key_hash(key), '') for key in old_groups)
+            db.executemany(
+                "INSERT OR REPLACE INTO groups (hash, keeper, signature) VALUES (?, ?, ?)",
+                upserts
+            )
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('settings', ?)",
+                       (settings,))
+            db.execute("DROP TABLE temp.dirty")
+            db.execute("DROP TABLE temp.source_rank")
+
+        return sorted(changes, key=itemgetter(1))
+
+    def duplicates_to_keep(self) -> List[str]:
+        """The stored keeper of every duplicate group, sorted."""
+        return [row[0] for row in self._db.execute("SELECT keeper FROM groups ORDER BY keeper")]
+
+    def duplicates_to_remove(self) -> List[str]:
+        """Every non-keeper path of every duplicate group, sorted."""
+        return [row[0] for row in self._db.execute(
+            "SELECT e.path FROM entries e JOIN groups g ON e.hash = g.hash"
+            " WHERE e.path != g.keeper ORDER BY e.path"
+        )]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def walk_files(directories: List[Path]) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Walk directories depth-first in sorted order, yielding regular files.
+
+    The given roots are followed if they are symlinks, but symlinks found
+    below them are not, so every file is reported under the path it
+    physically lives at, as a hash manifest of the tree would list it.
+
+    Args:
+        directories: Directories (or files) to walk, in order
+
+    Yields:
+        (path, stat) for every regular file
+    """
+    for root in map(str, directories):
+        try:
+            st = os.stat(root)
+        except OSError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+            continue
+        if stat.S_ISREG(st.st_mode):
+            yield root, st
+            continue
+        if not stat.S_ISDIR(st.st_mode):
+            print(f"Warning: skipping {root}: not a regular file or directory", file=sys.stderr)
             continue
 
-        # Additional defensive check: ensure we actually have multiple paths
-        assert len(paths) >= 2, f"Logic error: processing hash {hash_value} with {len(paths)} path(s)"
+        stack = [root]
+        while stack:
+            top = stack.pop()
+            try:
+                with os.scandir(top) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                print(f"Warning: {e}", file=sys.stderr)
+                continue
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    print(f"Warning: {e}", file=sys.stderr)
+            stack.extend(reversed(subdirs))
+
+
+def partial_hash(path: str, size: int, sample: int = PARTIAL_HASH_BYTES) -> bytes:
+    """
+    Hash the first and last sample bytes of a file (all of it if smaller).
 
-        # Determine which path to keep
-        keeper = find_keeper_path(paths, priorities)
-        paths_to_keep.append(keeper)
+    Only used to split same-size candidates, so any fast hash will do.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb', buffering=0) as f:
+        hasher.update(os.pread(f.fileno(), sample, 0))
+        if size > sample:
+            hasher.update(os.pread(f.fileno(), sample, max(sample, size - sample)))
+    return hasher.digest()
+
+
+def full_hash(path: str) -> str:
+    """
+    Compute a file's full hash the way the checksum script does by default.
+
+    Uses the blake3 library, or the b3sum utility, falling back to sha512
+    when neither is available.
+
+    Raises:
+        IOError: If the file cannot be read
+    """
+    if not HAS_BLAKE3 and HAS_B3SUM:
+        try:
+            result = subprocess.run(['b3sum', '--no-names', path],
+                                    capture_output=True, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            raise IOError(f"Error running b3sum on {path}: {e.stderr.strip()}")
+        return result.stdout.strip()
+
+    hasher = blake3.blake3() if HAS_BLAKE3 else hashlib.sha512()
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while n := f.readinto(buffer):
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def _hash_each_inode(pool: ThreadPoolExecutor, fn, files: List[tuple]) -> Dict[Tuple[int, int], object]:
+    """
+    Apply fn(path, size) to one path per inode of (order, path, inode, size) files.
+
+    Returns:
+        Mapping of inode to result; unreadable files are warned about and left out
+    """
+    unique: Dict[Tuple[int, int], tuple] = {}
+    for item in files:
+        unique.setdefault(item[2], item)
+
+    def attempt(item: tuple):
+        try:
+            return fn(item[1], item[3])
+        except OSError as e:
+            print(f"Warning: {e}", file=sys.stderr)
+            return None
+
+    results = {}
+    for inode, outcome in zip(unique, pool.map(attempt, unique.values())):
+        if outcome is not None:
+            results[inode] = outcome
+    return results
 
-    # Sort for consistent output
-    return sorted(paths_to_keep)
+
+def scan_duplicate_groups(directories: List[Path], jobs: int = 1
+                          ) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Find duplicate groups by walking directories, reading as little as possible.
+
+    Files are grouped by size; sizes held by one file cannot have
+    duplicates and are never read.  Same-size files are split by a hash
+    of their first and last PARTIAL_HASH_BYTES, which already covers
+    files up to twice that size, and only larger files that still
+    collide are hashed in full.  Hard links to one inode are read once.
+    Paths within a group keep walk order, as they would from a manifest.
+
+    Args:
+        directories: Directories to walk, in order
+        jobs: Threads reading files at once
+
+    Yields:
+        (hash, paths) for every group of files with identical contents
+    """
+    by_size: Dict[int, List[tuple]] = defaultdict(list)
+    scanned = 0
+    for order, (path, st) in enumerate(walk_files(directories)):
+        by_size[st.st_size].append((order, path, (st.st_dev, st.st_ino), st.st_size))
+        scanned += 1
+    same_size = [item for files in by_size.values() if len(files) > 1 for item in files]
+    del by_size
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        partial = _hash_each_inode(pool, partial_hash, same_size)
+        by_partial: Dict[Tuple[int, bytes], List[tuple]] = defaultdict(list)
+        for item in same_size:
+            if item[2] in partial:
+                by_partial[item[3], partial[item[2]]].append(item)
+        colliding = [item for files in by_partial.values() if len(files) > 1 for item in files]
+        del by_partial
+
+        # Small files were read whole by partial_hash; only large ones need a full hash
+        large = [item for item in colliding if item[3] > 2 * PARTIAL_HASH_BYTES]
+        full = _hash_each_inode(pool, lambda path, size: full_hash(path), large)
+
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for order, path, inode, size in sorted(colliding):
+        if size > 2 * PARTIAL_HASH_BYTES:
+            if inode in full:
+                groups[full[inode]].append(path)
+        else:
+            groups[f"{size}:{partial[inode].hex()}"].append(path)
+
+    print(f"Scanned {scanned} file(s): {len(same_size)} share a size, "
+          f"{len(colliding)} share a partial hash, {len(full)} fully hashed",
+          file=sys.stderr)
+    yield from groups.items()
 
 
 def main():
@@ -258,6 +1144,11 @@ def main():
 Example:
     %(prog)s priorities.txt hashes1.txt hashes2.txt
     %(prog)s --show-kept priorities.txt hashes1.txt hashes2.txt
+    %(prog)s --jobs 8 --show-kept priorities.txt tank-*.b3sums
+    %(prog)s --db dedup.db --changes priorities.txt host1.b3sums host2.b3sums
+    %(prog)s --scan --jobs 4 priorities.txt /tank/Pictures /tank/Photos
+    %(prog)s --external-sort --temp-dir /scratch priorities.txt tank-b3sums.txt
+    LC_ALL=C sort -o sorted.txt hashes.txt && %(prog)s --presorted priorities.txt sorted.txt
 
 Priority file format (one directory per line):
     /tank/Pictures
@@ -269,6 +1160,15 @@ Hash file format (whitespace-separated HASH PATH):
 
 By default, outputs all duplicate files to REMOVE (all but the highest priority one).
 With --show-kept, outputs only the files being KEPT (one per duplicate set).
+Streaming modes print paths group by group in hash order rather than sorted.
+With --scan, the positional arguments after the priority file are directories
+to walk instead of hash files: files are grouped by size, then by a hash of
+their first and last few KiB, and only files still colliding are fully
+hashed with blake3 (as by the checksum script).
+
+With --db, only hash files changed since the last run are parsed; --changes
+prints one "STATUS<TAB>HASH<TAB>KEEPER" line per duplicate group that is new,
+changed keeper, changed members, or was resolved since the last run.
         """
     )
 
@@ -282,7 +1182,7 @@ With --show-kept, outputs only the files being KEPT (one per duplicate set).
         'hash_files',
         type=Path,
         nargs='+',
-        help='One or more files containing "HASH PATH" pairs'
+        help='One or more files containing "HASH PATH" pairs (directories with --scan)'
     )
 
     parser.add_argument(
@@ -291,24 +1191,152 @@ With --show-kept, outputs only the files being KEPT (one per duplicate set).
         help='Show files to KEEP (one per duplicate set) instead of files to REMOVE'
     )
 
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Parse hash files in N worker processes, splitting large files into '
+             'byte ranges; with --scan, read N files at once. Not available with '
+             '--external-sort or --presorted (default: 1)'
+    )
+
+    parser.add_argument(
+        '--external-sort',
+        action='store_true',
+        help='Sort hash files on disk and stream duplicate groups, so memory is bounded '
+             'by --sort-buffer and the largest duplicate group instead of the file count'
+    )
+
+    parser.add_argument(
+        '--presorted',
+        action='store_true',
+        help='Hash files are already sorted by hash (LC_ALL=C sort); stream a k-way merge '
+             'of them without temporary files'
+    )
+
+    parser.add_argument(
+        '--sort-buffer',
+        type=int,
+        default=SORT_RUN_LINES,
+        metavar='LINES',
+        help=f'With --external-sort, lines sorted in memory per run (default: {SORT_RUN_LINES})'
+    )
+
+    parser.add_argument(
+        '--temp-dir',
+        help='With --external-sort, directory for sorted runs (default: system temp directory)'
+    )
+
+    parser.add_argument(
+        '--scan',
+        action='store_true',
+        help='Walk the given directories and hash files directly, reading only files '
+             'that share a size (and then a partial hash) with another file'
+    )
+
+    parser.add_argument(
+        '--db',
+        type=Path,
+        help='Keep a persistent SQLite index of the hash files and only re-ingest '
+             'those changed since the last run'
+    )
+
+    parser.add_argument(
+        '--changes',
+        action='store_true',
+        help='With --db, print only duplicate groups that changed since the last run'
+    )
+
     args = parser.parse_args()
 
-    # Parse priority directories
+    if args.scan and (args.db or args.external_sort or args.presorted):
+        parser.error("--scan cannot be combined with --db, --external-sort or --presorted")
+    if args.db and (args.external_sort or args.presorted):
+        parser.error("--db cannot be combined with --external-sort or --presorted")
+    if args.changes and not args.db:
+        parser.error("--changes requires --db")
+    if args.external_sort and args.presorted:
+        parser.error("--external-sort and --presorted are mutually exclusive")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.jobs > 1 and (args.external_sort or args.presorted):
+        parser.error("--jobs cannot be combined with --external-sort or --presorted")
+    if args.sort_buffer < 1:
+        parser.error("--sort-buffer must be at least 1")
+
+    # Parse priority directories and index them once for the whole run
     try:
-        priorities = parse_priority_file(args.priority_file)
+        priorities = PriorityIndex(parse_priority_file(args.priority_file))
     except (FileNotFoundError, ValueError) as e:
         print(f"Error reading priority file: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Collect all hash-path pairs
-    hash_to_paths = collect_all_hashes(args.hash_files)
+    if args.db:
+        # Incremental mode: parse changed hash files, re-evaluate touched groups
+        database = DedupDatabase(args.db)
+        try:
+            dirty, ingested = database.sync(args.hash_files)
+            changes = database.update_groups(dirty, args.hash_files, priorities)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error processing hash files: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Ingested {ingested} of {len(args.hash_files)} hash file(s); "
+              f"{len(changes)} duplicate group(s) changed", file=sys.stderr)
+
+        if args.changes:
+            for status, hash_value, keeper in changes:
+                print(f"{status}\t{hash_value}\t{keeper}")
+        else:
+            if args.show_kept:
+                paths_to_output = database.duplicates_to_keep()
+            else:
+                paths_to_output = database.duplicates_to_remove()
+            for path in paths_to_output:
+                print(path)
+            if not paths_to_output:
+                print("No duplicate files found.", file=sys.stderr)
+        database.close()
+        sys.exit(0)
+
+    if args.external_sort or args.presorted:
+        # Streaming mode: one duplicate group in memory at a time
+        groups = iter_hash_groups(iter_sorted_pairs(
+            args.hash_files, args.presorted, args.sort_buffer, args.temp_dir))
+        if args.show_kept:
+            paths_to_output = iter_duplicates_to_keep(groups, priorities)
+        else:
+            paths_to_output = iter_duplicates_to_remove(groups, priorities)
+
+        found = False
+        try:
+            for path in paths_to_output:
+                print(path)
+                found = True
+        except (FileNotFoundError, ValueError, OSError) as e:
+            print(f"Error processing hash files: {e}", file=sys.stderr)
+            sys.exit(1)
+
+        if not found:
+            print("No duplicate files found.", file=sys.stderr)
+        sys.exit(0)
+
+    if args.scan:
+        # Read files directly, pruning by size and partial hash first
+        groups = scan_duplicate_groups(args.hash_files, args.jobs)
+    elif all(is_rereadable(hash_file) for hash_file in args.hash_files):
+        # Two passes: paths are only materialized for repeated hashes
+        groups = iter_compact_groups(collect_duplicate_groups(args.hash_files, args.jobs))
+    else:
+        # Pipes can only be read once: collect all hash-path pairs
+        groups = collect_all_hashes(args.hash_files).items()
 
     # Find duplicates based on mode
     if args.show_kept:
-        paths_to_output = find_duplicates_to_keep(hash_to_paths, priorities)
+        paths_to_output = sorted(iter_duplicates_to_keep(groups, priorities))
         mode_description = "kept"
     else:
-        paths_to_output = find_duplicates_to_remove(hash_to_paths, priorities)
+        paths_to_output = sorted(iter_duplicates_to_remove(groups, priorities))
         mode_description = "to remove"
 
     # Output results
@@ -10,14 +10,63 @@ import email
 from email.message import Message
 import getpass
 import imaplib
+import io
 import json
 import os
+import queue
 import re
 import sys
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
 from email.header import decode_header
-from email.utils import parsedate_to_datetime
-from typing import Dict, List, Optional, Tuple, Any, Set
+from email.utils import collapse_rfc2231_value, decode_params, parsedate_to_datetime, unquote
+from typing import Dict, Iterator, List, Optional, Tuple, Any, Set
+
+# Messages are fetched in batches sized so each response carries about
+# FETCH_BATCH_BYTES, judged from the average size of the previous batch
+FETCH_ITEMS = '(UID FLAGS INTERNALDATE RFC822.SIZE BODY.PEEK[])'
+# With --bodystructure only the header is downloaded; part sizes come from BODYSTRUCTURE
+FETCH_STRUCTURE_ITEMS = '(UID FLAGS INTERNALDATE RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER])'
+FETCH_BATCH_BYTES = 16 * 1024 * 1024
+FETCH_FIRST_BATCH = 20
+FETCH_MAX_BATCH = 1000
+
+# With --workers, fetched messages wait in a queue of this many while the
+# process pool parses; each worker gets a few messages in flight at once
+PIPELINE_QUEUE_SIZE = 64
+PIPELINE_IN_FLIGHT_PER_WORKER = 4
+
+# --load sends rows to PostgreSQL with COPY in batches of this many
+COPY_BATCH_ROWS = 5000
+COPY_COLUMNS = ('mailbox', 'uid', 'message_id', 'flags', 'internal_date', 'rfc822_size',
+                'headers', 'body_length', 'attachment_count', 'attachment_total_size',
+                'scan_date')
+
+CREATE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS email_messages (
+    mailbox TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    flags TEXT[],
+    internal_date TIMESTAMP,
+    rfc822_size BIGINT,
+    headers JSONB NOT NULL,
+    body_length INTEGER NOT NULL DEFAULT 0,
+    attachment_count INTEGER NOT NULL DEFAULT 0,
+    attachment_total_size BIGINT NOT NULL DEFAULT 0,
+    scan_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (mailbox, uid)
+);"""
+
+INDEX_STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_message_id ON email_messages(message_id);",
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_mailbox ON email_messages(mailbox);",
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_internal_date ON email_messages(internal_date);",
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_flags ON email_messages USING GIN(flags);",
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_scan_date ON email_messages(scan_date);",
+    "CREATE INDEX IF NOT EXISTS idx_email_messages_headers ON email_messages USING GIN(headers);"
+]
 
 # Optional PostgreSQL support - only import when needed
 try:
@@ -152,31 +201,8 @@ def create_table_if_needed(conn, out) -> bool:
 
     print("Table email_messages doesn't exist, creating it...", file=sys.stderr)
 
-    # Define CREATE TABLE statement
-    create_table_sql = """CREATE TABLE IF NOT EXISTS email_messages (
-    mailbox TEXT NOT NULL,
-    uid TEXT NOT NULL,
-    message_id TEXT NOT NULL,
-    flags TEXT[],
-    internal_date TIMESTAMP,
-    rfc822_size BIGINT,
-    headers JSONB NOT NULL,
-    body_length INTEGER NOT NULL DEFAULT 0,
-    attachment_count INTEGER NOT NULL DEFAULT 0,
-    attachment_total_size BIGINT NOT NULL DEFAULT 0,
-    scan_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY (mailbox, uid)
-);"""
-
-    # Define index creation statements
-    index_statements = [
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_message_id ON email_messages(message_id);",
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_mailbox ON email_messages(mailbox);",
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_internal_date ON email_messages(internal_date);",
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_flags ON email_messages USING GIN(flags);",
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_scan_date ON email_messages(scan_date);",
-        "CREATE INDEX IF NOT EXISTS idx_email_messages_headers ON email_messages USING GIN(headers);"
-    ]
+    create_table_sql = CREATE_TABLE_SQL
+    index_statements = INDEX_STATEMENTS
 
     # Execute CREATE TABLE and indexes against the database
     try:
@@ -211,6 +237,127 @@ def create_table_if_needed(conn, out) -> bool:
     return True
 
 
+def copy_text_value(value: Any) -> str:
+    """Format one value for PostgreSQL COPY text format.
+
+    Args:
+        value: None, a number, a string, a list of strings (TEXT[]) or a
+            dict (JSONB)
+
+    Returns:
+        Field text with tabs, newlines and backslashes escaped, or \\N for NULL
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, dict):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, list):
+        # Array literal: every element quoted, with " and \\ backslash-escaped
+        value = '{' + ','.join(
+            '"' + v.replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value
+        ) + '}'
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class CopyLoader:
+    """Load analyzed messages straight into email_messages with COPY.
+
+    Rows are buffered and sent COPY_BATCH_ROWS at a time over the existing
+    database connection.  In incremental mode each batch goes through a
+    temporary staging table and is upserted on (mailbox, uid), then
+    committed, so an interrupted run keeps what it loaded.  A full load
+    recreates the table, adds the indexes after the data, and commits once.
+    """
+
+    def __init__(self, conn, incremental: bool = False, batch_rows: Optional[int] = None):
+        self.conn = conn
+        self.incremental = incremental
+        self.batch_rows = batch_rows or COPY_BATCH_ROWS
+        self.buffer = io.StringIO()
+        self.pending = 0
+        self.loaded = 0
+        columns = ', '.join(COPY_COLUMNS)
+        if incremental:
+            self.copy_sql = f"COPY email_messages_staging ({columns}) FROM STDIN"
+        else:
+            self.copy_sql = f"COPY email_messages ({columns}) FROM STDIN"
+
+    def _execute(self, statements: List[str]):
+        try:
+            with self.conn.cursor() as cur:
+                for sql in statements:
+                    cur.execute(sql)
+        except psycopg2.Error as e:
+            print(f"Error loading into database: {e}", file=sys.stderr)
+            self.conn.rollback()
+            sys.exit(1)
+
+    def start(self):
+        """Prepare the target table (and staging table) for loading."""
+        if self.incremental:
+            self._execute([
+                "CREATE TEMP TABLE IF NOT EXISTS email_messages_staging "
+                "(LIKE email_messages INCLUDING DEFAULTS)",
+            ])
+        else:
+            self._execute([
+                "DROP TABLE IF EXISTS email_messages CASCADE",
+                CREATE_TABLE_SQL,
+            ])
+
+    def add(self, message_info: Dict[str, Any], scan_date: str):
+        """Queue one analyzed message, sending a batch when the buffer is full.
+
+        Args:
+            message_info: Message metadata from analyze_message
+            scan_date: Timestamp of this scan in ISO format
+        """
+        row = dict(message_info, scan_date=scan_date)
+        self.buffer.write('\t'.join(copy_text_value(row[c]) for c in COPY_COLUMNS))
+        self.buffer.write('\n')
+        self.pending += 1
+        if self.pending >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Send the buffered rows."""
+        if not self.pending:
+            return
+        self.buffer.seek(0)
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(self.copy_sql, self.buffer)
+                if self.incremental:
+                    columns = ', '.join(COPY_COLUMNS)
+                    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in COPY_COLUMNS[2:])
+                    cur.execute(
+                        f"INSERT INTO email_messages ({columns}) "
+                        f"SELECT {columns} FROM email_messages_staging "
+                        f"ON CONFLICT (mailbox, uid) DO UPDATE SET {updates}"
+                    )
+                    cur.execute("TRUNCATE email_messages_staging")
+            if self.incremental:
+                self.conn.commit()
+        except psycopg2.Error as e:
+            print(f"Error loading into database: {e}", file=sys.stderr)
+            self.conn.rollback()
+            sys.exit(1)
+        self.loaded += self.pending
+        self.pending = 0
+        self.buffer = io.StringIO()
+
+    def finish(self):
+        """Send the remaining rows, build indexes after a full load, and commit."""
+        self.flush()
+        if not self.incremental:
+            self._execute(INDEX_STATEMENTS)
+        self.conn.commit()
+        print(f"  Loaded {self.loaded} rows into email_messages", file=sys.stderr)
+
+
 def connect_imap(host: Optional[str] = None,
                  port: int = 993,
                  username: Optional[str] = None,
@@ -476,6 +623,173 @@ def get_attachment_info(msg: Message) -> Tuple[int, int]:
     return attachment_count, total_size
 
 
+def parse_imap_list(text: str, pos: int = 0) -> Tuple[Any, int]:
+    """Parse one IMAP value (parenthesized list, string, number or NIL).
+
+    Args:
+        text: IMAP response text
+        pos: Offset of the value in text
+
+    Returns:
+        Tuple of (value, offset just past it); lists become Python lists,
+        NIL becomes None and numbers become ints
+    """
+    while text[pos] == ' ':
+        pos += 1
+    if text[pos] == '(':
+        values = []
+        pos += 1
+        while True:
+            while text[pos] == ' ':
+                pos += 1
+            if text[pos] == ')':
+                return values, pos + 1
+            value, pos = parse_imap_list(text, pos)
+            values.append(value)
+    if text[pos] == '"':
+        chars = []
+        pos += 1
+        while text[pos] != '"':
+            if text[pos] == '\\':
+                pos += 1
+            chars.append(text[pos])
+            pos += 1
+        return ''.join(chars), pos + 1
+    match = re.compile(r'[^\s()]+').match(text, pos)
+    atom = match.group(0)
+    if atom.upper() == 'NIL':
+        return None, match.end()
+    return (int(atom) if atom.isdigit() else atom), match.end()
+
+
+def parse_bodystructure(fetch_str: str) -> Optional[List[Any]]:
+    """Extract and parse the BODYSTRUCTURE from FETCH response text.
+
+    Args:
+        fetch_str: Metadata text of one message from parse_fetch_response
+
+    Returns:
+        Nested list form of the body structure, or None if absent or unparsable
+    """
+    match = re.search(r'BODYSTRUCTURE \(', fetch_str)
+    if not match:
+        return None
+    try:
+        return parse_imap_list(fetch_str, match.end() - 1)[0]
+    except (IndexError, AttributeError) as e:
+        print(f"Warning: Error parsing BODYSTRUCTURE: {e}", file=sys.stderr)
+        return None
+
+
+def iter_structure_parts(structure: List[Any]) -> Iterator[Dict[str, Any]]:
+    """Walk the parts of a parsed BODYSTRUCTURE as Message.walk() would.
+
+    Multipart containers are skipped.  A message/rfc822 part is yielded
+    itself (with size 0, since its octets belong to the parts inside it,
+    just as walk() decodes no payload for it) and then descended into, so
+    forwarded messages count the same as without --bodystructure.
+
+    Args:
+        structure: Parsed body structure from parse_bodystructure
+
+    Yields:
+        Dicts with content_type, size (encoded octets), disposition and filename
+    """
+    if structure and isinstance(structure[0], list):
+        # Multipart: child bodies, then the subtype and extension data
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            yield from iter_structure_parts(child)
+        return
+
+    def field(index):
+        return structure[index] if len(structure) > index else None
+
+    def param_dict(params):
+        if not isinstance(params, list):
+            return {}
+        # Decode RFC 2231 name*= and name*0*= parameters the way get_filename() does
+        pairs = [(str(k).lower(), str(v)) for k, v in zip(params[::2], params[1::2])
+                 if v is not None]
+        decoded = {}
+        for name, value in decode_params([('', '')] + pairs)[1:]:
+            if isinstance(value, tuple):
+                value = (value[0], value[1], unquote(value[2]))
+            else:
+                value = unquote(value)
+            decoded[name] = collapse_rfc2231_value(value)
+        return decoded
+
+    content_type = f"{field(0) or 'text'}/{field(1) or 'plain'}".lower()
+    size = field(6) if isinstance(field(6), int) else 0
+
+    # Extension data starts after the type-specific fields
+    if content_type.startswith('text/'):
+        extension = 8
+    elif content_type == 'message/rfc822':
+        extension = 10
+    else:
+        extension = 7
+    disposition = field(extension + 1)
+    disposition_type = ''
+    disposition_params = {}
+    if isinstance(disposition, list) and disposition:
+        disposition_type = str(disposition[0] or '').lower()
+        disposition_params = param_dict(disposition[1] if len(disposition) > 1 else None)
+
+    filename = disposition_params.get('filename') or param_dict(field(2)).get('name')
+    encapsulated = field(8) if content_type == 'message/rfc822' else None
+    yield {
+        'content_type': content_type,
+        'size': 0 if isinstance(encapsulated, list) else size,
+        'disposition': disposition_type,
+        'filename': decode_mime_header(filename) if filename else None,
+    }
+    if isinstance(encapsulated, list):
+        yield from iter_structure_parts(encapsulated)
+
+
+def get_structure_info(structure: List[Any]) -> Tuple[int, int, int]:
+    """Get body length and attachment info from a parsed BODYSTRUCTURE.
+
+    Applies the same rules as calculate_body_length and get_attachment_info,
+    but sizes are the encoded octets the server reports (base64 parts are
+    about a third larger than their decoded payload).
+
+    Args:
+        structure: Parsed body structure from parse_bodystructure
+
+    Returns:
+        Tuple of (body_length, attachment_count, total_attachment_size)
+    """
+    body_length = 0
+    attachment_count = 0
+    total_size = 0
+    is_multipart = bool(structure) and isinstance(structure[0], list)
+
+    for part in iter_structure_parts(structure):
+        content_type = part['content_type']
+        if content_type in ('text/plain', 'text/html'):
+            body_length += part['size']
+
+        # Single part messages have no attachments, as in get_attachment_info
+        if not is_multipart:
+            continue
+        disposition = part['disposition']
+        filename = part['filename']
+        is_attachment = (
+            'attachment' in disposition or
+            ('inline' in disposition and filename) or
+            (filename and not disposition and content_type not in ('text/plain', 'text/html'))
+        )
+        if is_attachment:
+            attachment_count += 1
+            total_size += part['size']
+
+    return body_length, attachment_count, total_size
+
+
 def parse_imap_flags(flags_bytes: bytes) -> List[str]:
     """Parse IMAP flags from FETCH response.
 
@@ -534,16 +848,19 @@ def parse_imap_internaldate(date_bytes: bytes) -> Optional[str]:
 
 
 def analyze_message(msg_data: bytes, mailbox: str, uid: str, flags: List[str],
-                    internal_date: Optional[str], rfc822_size: Optional[int]) -> Optional[Dict[str, Any]]:
+                    internal_date: Optional[str], rfc822_size: Optional[int],
+                    structure: Optional[List[Any]] = None) -> Optional[Dict[str, Any]]:
     """Parse and analyze a single email message.
 
     Args:
-        msg_data: Raw message data
+        msg_data: Raw message data (just the header if structure is given)
         mailbox: Name of the mailbox containing the message
         uid: IMAP UID of the message
         flags: List of IMAP flags
         internal_date: IMAP INTERNALDATE in ISO format
         rfc822_size: RFC822.SIZE from IMAP
+        structure: Parsed BODYSTRUCTURE to take body and attachment sizes
+            from, instead of decoding the body
 
     Returns:
         Dictionary with message metadata or None on error
@@ -557,11 +874,14 @@ def analyze_message(msg_data: bytes, mailbox: str, uid: str, flags: List[str],
         # Extract all headers
         headers = extract_all_headers(msg)
 
-        # Calculate body length
-        body_length = calculate_body_length(msg)
+        if structure is not None:
+            body_length, attachment_count, attachment_size = get_structure_info(structure)
+        else:
+            # Calculate body length
+            body_length = calculate_body_length(msg)
 
-        # Get attachment info
-        attachment_count, attachment_size = get_attachment_info(msg)
+            # Get attachment info
+            attachment_count, attachment_size = get_attachment_info(msg)
 
         return {
             'message_id': message_id,
@@ -635,11 +955,425 @@ def format_array_for_sql(values: List[str]) -> str:
     return f"ARRAY[{', '.join(escaped_values)}]"
 
 
+def search_uids(imap: imaplib.IMAP4) -> Optional[List[str]]:
+    """Get the UIDs of every message in the selected mailbox.
+
+    Args:
+        imap: IMAP connection object with a mailbox selected
+
+    Returns:
+        List of UIDs (as strings, like the database's uid column) in mailbox
+        order, or None if the search failed
+    """
+    status, data = imap.uid('SEARCH', None, 'ALL')
+    if status != 'OK':
+        return None
+    if not data or not data[0]:
+        return []
+    return data[0].decode('ascii').split()
+
+
+def mailbox_unchanged(imap: imaplib.IMAP4, mailbox: str, known_uids: Set[str]) -> bool:
+    """Check with STATUS whether a mailbox has no messages beyond the known ones.
+
+    UIDs only ever increase, so if UIDNEXT is still one past the highest known
+    UID nothing has been added; if the message count also matches, nothing
+    has been removed either.  This saves selecting and searching the mailbox.
+
+    Args:
+        imap: IMAP connection object
+        mailbox: Mailbox name
+        known_uids: UIDs of the mailbox already in the database
+
+    Returns:
+        True if the mailbox certainly holds just the known messages
+    """
+    if not known_uids:
+        return False
+    try:
+        status, data = imap.status(mailbox, '(MESSAGES UIDNEXT)')
+    except imaplib.IMAP4.error:
+        return False
+    if status != 'OK' or not data or not data[0]:
+        return False
+
+    status_str = data[0].decode('utf-8', errors='replace') if isinstance(data[0], bytes) else str(data[0])
+    messages_match = re.search(r'MESSAGES (\d+)', status_str)
+    uidnext_match = re.search(r'UIDNEXT (\d+)', status_str)
+    if not messages_match or not uidnext_match:
+        return False
+
+    highest_known = max(int(uid) for uid in known_uids)
+    return (int(messages_match.group(1)) == len(known_uids) and
+            int(uidnext_match.group(1)) == highest_known + 1)
+
+
+def compress_uid_set(uids: List[str]) -> str:
+    """Build a compact IMAP UID set, e.g. ['1', '2', '3', '7'] -> '1:3,7'.
+
+    Args:
+        uids: UIDs as strings
+
+    Returns:
+        Sequence set with runs of consecutive UIDs collapsed into ranges
+    """
+    ranges = []
+    for uid in sorted({int(u) for u in uids}):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(lo) if lo == hi else f"{lo}:{hi}" for lo, hi in ranges)
+
+
+def parse_fetch_response(data: List[Any]) -> List[Tuple[str, Optional[bytes]]]:
+    """Split a multi-message FETCH response into per-message pieces.
+
+    imaplib returns each message carrying a literal as a (prefix, literal)
+    tuple, followed by a bytes item with whatever came after the literal
+    (often just ')', but servers may put UID or FLAGS there too).  When a
+    message has several literals (say a filename in BODYSTRUCTURE before
+    the header), all but the last are put back into the metadata as quoted
+    strings.
+
+    Args:
+        data: Data list returned by imap.uid('FETCH', ...)
+
+    Returns:
+        List of (metadata text, last literal or None) per message, the
+        metadata being the prefix and trailers joined together
+    """
+    entries = []
+    for item in data:
+        if isinstance(item, tuple):
+            if entries and entries[-1][1] is not None and not re.match(rb'\d+ \(', item[0]):
+                # Another literal of the same message: inline the previous one
+                meta, literal = entries[-1]
+                quoted = literal.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+                entries[-1] = [re.sub(rb'\{\d+\}$', b'', meta) + b'"' + quoted + b'"' + item[0],
+                               item[1]]
+            else:
+                entries.append([item[0], item[1]])
+        elif isinstance(item, bytes):
+            if entries and not re.match(rb'\d+ \(', item):
+                # Trailer of the previous message, after its literal
+                entries[-1][0] += item
+            else:
+                entries.append([item, None])
+    return [(meta.decode('utf-8', errors='replace'), literal) for meta, literal in entries]
+
+
+def parse_fetch_metadata(fetch_str: str) -> Tuple[List[str], Optional[str], Optional[int]]:
+    """Extract FLAGS, INTERNALDATE and RFC822.SIZE from FETCH response text.
+
+    Args:
+        fetch_str: Metadata text of one message from parse_fetch_response
+
+    Returns:
+        Tuple of (flags, internal_date in ISO format, rfc822_size)
+    """
+    # Extract FLAGS
+    flags_match = re.search(r'FLAGS \(([^)]*)\)', fetch_str)
+    flags = []
+    if flags_match:
+        flags_content = flags_match.group(1).strip()
+        if flags_content:
+            flags = [f.strip() for f in flags_content.split() if f.strip()]
+
+    # Extract INTERNALDATE
+    internaldate_match = re.search(r'INTERNALDATE "([^"]+)"', fetch_str)
+    internal_date = None
+    if internaldate_match:
+        try:
+            dt = parsedate_to_datetime(internaldate_match.group(1))
+            internal_date = dt.isoformat()
+        except Exception as e:
+            print(f"  Warning: Failed to parse INTERNALDATE: {e}", file=sys.stderr)
+
+    # Extract RFC822.SIZE
+    size_match = re.search(r'RFC822\.SIZE (\d+)', fetch_str)
+    rfc822_size = int(size_match.group(1)) if size_match else None
+
+    return flags, internal_date, rfc822_size
+
+
+def fetch_messages(imap: imaplib.IMAP4, uids: List[str], stats: Dict[str, Any],
+                   items: str = FETCH_ITEMS) -> Iterator[Tuple[str, str, bytes]]:
+    """Fetch messages and their metadata in batches of UIDs.
+
+    Each batch is one UID FETCH of FETCH_ITEMS over a compact UID set, sized
+    from the average message size seen so far to stay near FETCH_BATCH_BYTES.
+    If a batch fails it is retried one message at a time, so a single bad
+    message only costs itself; messages that still cannot be fetched are
+    counted in stats['errors'].
+
+    Args:
+        imap: IMAP connection object with the mailbox selected
+        uids: UIDs to fetch
+        stats: Scan statistics, updated with fetch errors
+        items: FETCH data items, ending with the BODY.PEEK section to download
+
+    Yields:
+        Tuples of (uid, metadata text, raw message or header)
+    """
+    batch_size = FETCH_FIRST_BATCH
+    pos = 0
+    while pos < len(uids):
+        batch = uids[pos:pos + batch_size]
+        pos += len(batch)
+
+        try:
+            status, msg_data = imap.uid('FETCH', compress_uid_set(batch), items)
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error as e:
+            status, msg_data = 'NO', [str(e).encode()]
+        if status != 'OK':
+            if len(batch) > 1:
+                # Retry individually to find the message the server refused
+                yield from fetch_messages_one_by_one(imap, batch, stats, items)
+                continue
+            msg_data = []
+
+        received = 0
+        missing = set(batch)
+        for fetch_str, raw_message in parse_fetch_response(msg_data):
+            uid_match = re.search(r'UID (\d+)', fetch_str)
+            if not uid_match or uid_match.group(1) not in missing or raw_message is None:
+                continue
+            uid = uid_match.group(1)
+            missing.discard(uid)
+            received += len(raw_message)
+            yield uid, fetch_str, raw_message
+
+        for uid in batch:
+            if uid in missing:
+                print(f"  Warning: Failed to fetch message {uid}", file=sys.stderr)
+                stats['errors'] += 1
+
+        # Size the next batch from what this one averaged per message
+        fetched = len(batch) - len(missing)
+        if fetched:
+            average = max(received // fetched, 1)
+            batch_size = max(1, min(FETCH_MAX_BATCH, FETCH_BATCH_BYTES // average))
+
+
+def fetch_messages_one_by_one(imap: imaplib.IMAP4, uids: List[str], stats: Dict[str, Any],
+                              items: str = FETCH_ITEMS) -> Iterator[Tuple[str, str, bytes]]:
+    """Fetch each UID on its own, after a batch containing it failed.
+
+    Args:
+        imap: IMAP connection object with the mailbox selected
+        uids: UIDs to fetch
+        stats: Scan statistics, updated with fetch errors
+        items: FETCH data items, as for fetch_messages
+
+    Yields:
+        Tuples of (uid, metadata text, raw message)
+    """
+    for uid in uids:
+        try:
+            status, msg_data = imap.uid('FETCH', uid, items)
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error:
+            status, msg_data = 'NO', []
+        entries = parse_fetch_response(msg_data) if status == 'OK' else []
+        entries = [(fetch_str, raw) for fetch_str, raw in entries if raw is not None]
+        if not entries:
+            print(f"  Warning: Failed to fetch message {uid}", file=sys.stderr)
+            stats['errors'] += 1
+            continue
+        yield uid, entries[0][0], entries[0][1]
+
+
+def prefetch(items: Iterator[Any], maxsize: int) -> Iterator[Any]:
+    """Run an iterator on a background thread, buffering up to maxsize items.
+
+    Closing the returned generator stops the thread after the item it is
+    producing, so the IMAP connection is idle again once close() returns.
+
+    Args:
+        items: Iterator to drain (e.g. fetch_messages)
+        maxsize: Most items to hold before the producer waits
+
+    Yields:
+        The items, in order; an exception in the producer is re-raised here
+    """
+    buffer: queue.Queue = queue.Queue(maxsize)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except BaseException as e:
+            put((done, e))
+
+    thread = threading.Thread(target=produce, name='imap-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def report_progress(items: Iterator[Any], total: int, every: int = 100) -> Iterator[Any]:
+    """Pass items through, printing a progress line every `every` items.
+
+    Args:
+        items: Fetched messages, counted whether or not they parse
+        total: Number of messages expected
+        every: Items between progress lines
+    """
+    for idx, item in enumerate(items, 1):
+        yield item
+        if idx % every == 0:
+            print(f"  Processed {idx}/{total} messages...", file=sys.stderr)
+
+
+def analyze_fetched(fetched: Iterator[Tuple[str, str, bytes]], mailbox: str,
+                    use_bodystructure: bool, seen_message_keys: Set[Tuple[str, str]],
+                    stats: Dict[str, Any], pool: Optional[ProcessPoolExecutor] = None,
+                    workers: int = 1) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Analyze fetched messages, inline or in a process pool, in fetch order.
+
+    With a pool, up to PIPELINE_IN_FLIGHT_PER_WORKER messages per worker are
+    parsed concurrently; results are still yielded in the order fetched, so
+    the output does not depend on the number of workers.  Duplicates and
+    messages that fail to parse are counted in stats and not yielded.
+
+    Args:
+        fetched: (uid, metadata text, raw message) tuples from fetch_messages
+        mailbox: Name of the mailbox being scanned
+        use_bodystructure: Take sizes from BODYSTRUCTURE in the metadata
+        seen_message_keys: (mailbox, uid) pairs already processed
+        stats: Scan statistics
+        pool: Process pool to run analyze_message in, or None for inline
+        workers: Number of processes in the pool
+
+    Yields:
+        Tuples of (uid, message_info)
+    """
+    pending: deque = deque()
+    in_flight = PIPELINE_IN_FLIGHT_PER_WORKER * workers
+
+    def finish(uid: str, outcome: Any) -> Optional[Dict[str, Any]]:
+        try:
+            message_info = outcome.result() if isinstance(outcome, Future) else outcome
+        except Exception as e:
+            print(f"  Warning: Error processing message {uid}: {e}", file=sys.stderr)
+            message_info = None
+        if not message_info:
+            stats['errors'] += 1
+        return message_info
+
+    for uid, fetch_str, raw_message in fetched:
+        try:
+            flags, internal_date, rfc822_size = parse_fetch_metadata(fetch_str)
+
+            structure = None
+            if use_bodystructure:
+                structure = parse_bodystructure(fetch_str)
+                if structure is None:
+                    stats['errors'] += 1
+                    continue
+
+            # Check for duplicate (mailbox, uid) pair
+            message_key = (mailbox, uid)
+            if message_key in seen_message_keys:
+                stats['duplicates'] += 1
+                continue
+
+            seen_message_keys.add(message_key)
+
+            # Parse message
+            args = (raw_message, mailbox, uid, flags, internal_date, rfc822_size, structure)
+            if pool:
+                pending.append((uid, pool.submit(analyze_message, *args)))
+            else:
+                pending.append((uid, analyze_message(*args)))
+
+        except Exception as e:
+            print(f"  Warning: Error processing message {uid}: {e}",
+                  file=sys.stderr)
+            stats['errors'] += 1
+            continue
+
+        # Emit finished results in order, waiting only when the window is full
+        while pending and (len(pending) >= in_flight or not isinstance(pending[0][1], Future)
+                           or pending[0][1].done()):
+            done_uid, outcome = pending.popleft()
+            message_info = finish(done_uid, outcome)
+            if message_info:
+                yield done_uid, message_info
+
+    while pending:
+        done_uid, outcome = pending.popleft()
+        message_info = finish(done_uid, outcome)
+        if message_info:
+            yield done_uid, message_info
+
+
+def write_insert(out, message_info: Dict[str, Any], scan_date: str):
+    """Write the INSERT statement for one analyzed message.
+
+    Args:
+        out: Output file handle for SQL
+        message_info: Message metadata from analyze_message
+        scan_date: Timestamp of this scan in ISO format
+    """
+    out.write("INSERT INTO email_messages (mailbox, uid, message_id, flags, ")
+    out.write("internal_date, rfc822_size, headers, body_length, ")
+    out.write("attachment_count, attachment_total_size, scan_date)\n")
+    out.write("VALUES (")
+    out.write(f"{escape_sql_string(message_info['mailbox'])}, ")
+    out.write(f"{escape_sql_string(message_info['uid'])}, ")
+    out.write(f"{escape_sql_string(message_info['message_id'])}, ")
+    out.write(f"{format_array_for_sql(message_info['flags'])}, ")
+    if message_info['internal_date']:
+        out.write(f"'{message_info['internal_date']}', ")
+    else:
+        out.write("NULL, ")
+    if message_info['rfc822_size'] is not None:
+        out.write(f"{message_info['rfc822_size']}, ")
+    else:
+        out.write("NULL, ")
+    out.write(f"{format_json_for_sql(message_info['headers'])}::jsonb, ")
+    out.write(f"{message_info['body_length']}, ")
+    out.write(f"{message_info['attachment_count']}, ")
+    out.write(f"{message_info['attachment_total_size']}, ")
+    out.write(f"'{scan_date}'")
+    out.write(");\n")
+
+
 def scan_all_mailboxes(imap: imaplib.IMAP4,
                        mailbox_names: List[str],
                        output_file: Optional[str] = None,
                        incremental: bool = False,
-                       db_conn=None) -> Dict[str, Any]:
+                       db_conn=None,
+                       use_bodystructure: bool = False,
+                       load: bool = False,
+                       workers: int = 1) -> Dict[str, Any]:
     """Scan all mailboxes and generate PostgreSQL script.
 
     Args:
@@ -648,6 +1382,11 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
         output_file: Optional output file path (None for stdout)
         incremental: Enable incremental mode (only process new messages)
         db_conn: Database connection (required for incremental mode)
+        use_bodystructure: Download only headers and take sizes from BODYSTRUCTURE
+        load: Load rows into db_conn with COPY instead of writing INSERT
+            statements; the output then only records the scan statistics
+        workers: Number of processes parsing messages while the IMAP
+            connection keeps fetching on a background thread (1 parses inline)
 
     Returns:
         Dictionary with scan statistics
@@ -663,6 +1402,7 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
     else:
         out = sys.stdout
 
+    pool = None
     try:
         # Write SQL header
         out.write("-- IMAP Mailbox Analysis\n")
@@ -671,15 +1411,28 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
             out.write("-- Mode: Incremental (only new messages)\n")
         else:
             out.write("-- Mode: Full scan\n")
+        if use_bodystructure:
+            out.write("-- Sizes: BODYSTRUCTURE (encoded octets)\n")
+        if load:
+            out.write("-- Rows loaded directly into PostgreSQL with COPY\n")
         out.write("-- \n\n")
 
-        out.write("BEGIN;\n\n")
+        loader = None
+        if load:
+            loader = CopyLoader(db_conn, incremental=incremental)
+        else:
+            out.write("BEGIN;\n\n")
 
         # Handle table creation based on mode
         if incremental:
             # In incremental mode, create table if needed
             if db_conn:
                 create_table_if_needed(db_conn, out)
+            if loader:
+                loader.start()
+        elif loader:
+            # The loader drops and recreates the table itself
+            loader.start()
         else:
             # In full mode, drop and recreate table
             out.write("DROP TABLE IF EXISTS email_messages CASCADE;\n\n")
@@ -722,6 +1475,12 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
         seen_message_keys = set()  # Track (mailbox, uid) pairs
         scan_date = datetime.now().isoformat()
 
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            # Start the workers while this is the only thread: forking once
+            # prefetch() is reading from IMAP could copy a lock it holds
+            pool.submit(int).result()
+
         # Scan each mailbox
         for mailbox_idx, mailbox in enumerate(mailbox_names, 1):
             print(f"\nScanning mailbox {mailbox_idx} of {stats['total_mailboxes']}: {mailbox}",
@@ -734,6 +1493,14 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
                     known_uids = get_known_uids(db_conn, mailbox)
                     print(f"  Found {len(known_uids)} existing messages in database", file=sys.stderr)
 
+                # An unchanged mailbox costs one STATUS round trip
+                if incremental and mailbox_unchanged(imap, mailbox, known_uids):
+                    print(f"  Unchanged since last scan, skipping {len(known_uids)} known messages",
+                          file=sys.stderr)
+                    stats['already_in_db'] += len(known_uids)
+                    stats['skipped_messages'] += len(known_uids)
+                    continue
+
                 # Select mailbox (readonly)
                 status, messages = imap.select(mailbox, readonly=True)
                 if status != 'OK':
@@ -741,183 +1508,61 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
                     stats['errors'] += 1
                     continue
 
-                # Get all message IDs
-                status, message_ids = imap.search(None, 'ALL')
-                if status != 'OK':
+                # Get all UIDs in one round trip
+                uid_list = search_uids(imap)
+                if uid_list is None:
                     print(f"  Failed to search messages in {mailbox}", file=sys.stderr)
                     stats['errors'] += 1
                     continue
 
-                msg_id_list = message_ids[0].split()
-                total_in_mailbox = len(msg_id_list)
+                total_in_mailbox = len(uid_list)
 
                 print(f"  Found {total_in_mailbox} messages", file=sys.stderr)
 
-                # Count messages to process and skip
-                messages_to_process = []
-                messages_to_skip = 0
-
                 # First pass: identify which messages to process
-                for idx, msg_id in enumerate(msg_id_list, 1):
-                    try:
-                        # Fetch UID only first to check if we need to process this message
-                        status, msg_data = imap.fetch(msg_id, '(UID)')
-
-                        if status != 'OK' or not msg_data or not msg_data[0]:
-                            stats['errors'] += 1
-                            continue
-
-                        # Extract UID
-                        fetch_str = msg_data[0].decode('utf-8', errors='replace') if isinstance(msg_data[0], bytes) else str(msg_data[0])
-                        uid_match = re.search(r'UID (\d+)', fetch_str)
-                        uid = uid_match.group(1) if uid_match else msg_id.decode()
-
-                        # Check if we should skip this message (incremental mode)
-                        if incremental and uid in known_uids:
-                            messages_to_skip += 1
-                            stats['already_in_db'] += 1
-                            continue
-
-                        messages_to_process.append(msg_id)
-
-                    except Exception as e:
-                        print(f"  Warning: Error checking message {msg_id.decode()}: {e}",
-                              file=sys.stderr)
-                        stats['errors'] += 1
-                        continue
+                if incremental:
+                    messages_to_process = [uid for uid in uid_list if uid not in known_uids]
+                else:
+                    messages_to_process = uid_list
+                messages_to_skip = total_in_mailbox - len(messages_to_process)
+                stats['already_in_db'] += messages_to_skip
 
                 # Show skip/process summary
                 if incremental:
                     print(f"  Skipping {messages_to_skip} known messages, processing {len(messages_to_process)} new messages...",
                           file=sys.stderr)
 
-                # Second pass: process messages
-                for idx, msg_id in enumerate(messages_to_process, 1):
-                    try:
-                        # Fetch complete message with metadata
-                        # Use BODY.PEEK to avoid marking messages as seen
-                        status, msg_data = imap.fetch(msg_id, '(UID FLAGS INTERNALDATE RFC822.SIZE BODY.PEEK[HEADER])')
-
-                        if status != 'OK' or not msg_data or not msg_data[0]:
-                            print(f"  Warning: Failed to fetch message {msg_id.decode()}",
-                                  file=sys.stderr)
-                            stats['errors'] += 1
-                            continue
-
-                        # Parse the FETCH response
-                        # The response is a tuple like: (b'1 (UID 1234 FLAGS (\\Seen) ...)', b'header data')
-                        fetch_response = msg_data[0]
-                        if isinstance(fetch_response, tuple):
-                            fetch_parts = fetch_response[0]
-                            header_data = fetch_response[1]
-                        else:
-                            # Sometimes the response format is different
-                            fetch_parts = fetch_response
-                            header_data = None
-
-                        # Convert to string for parsing
-                        if isinstance(fetch_parts, bytes):
-                            fetch_str = fetch_parts.decode('utf-8', errors='replace')
-                        else:
-                            fetch_str = str(fetch_parts)
-
-                        # Extract UID
-                        uid_match = re.search(r'UID (\d+)', fetch_str)
-                        uid = uid_match.group(1) if uid_match else msg_id.decode()
-
-                        # Extract FLAGS
-                        flags_match = re.search(r'FLAGS \(([^)]*)\)', fetch_str)
-                        flags = []
-                        if flags_match:
-                            flags_content = flags_match.group(1).strip()
-                            if flags_content:
-                                flags = [f.strip() for f in flags_content.split() if f.strip()]
-
-                        # Extract INTERNALDATE
-                        internaldate_match = re.search(r'INTERNALDATE "([^"]+)"', fetch_str)
-                        internal_date = None
-                        if internaldate_match:
-                            try:
-                                dt = parsedate_to_datetime(internaldate_match.group(1))
-                                internal_date = dt.isoformat()
-                            except Exception as e:
-                                print(f"  Warning: Failed to parse INTERNALDATE: {e}", file=sys.stderr)
-
-                        # Extract RFC822.SIZE
-                        size_match = re.search(r'RFC822\.SIZE (\d+)', fetch_str)
-                        rfc822_size = int(size_match.group(1)) if size_match else None
-
-                        # Check for duplicate (mailbox, uid) pair
-                        message_key = (mailbox, uid)
-                        if message_key in seen_message_keys:
-                            stats['duplicates'] += 1
-                            continue
-
-                        seen_message_keys.add(message_key)
-
-                        # Now fetch the full message body for analysis
-                        status, body_data = imap.fetch(msg_id, '(BODY.PEEK[])')
-                        if status != 'OK' or not body_data or not body_data[0]:
-                            print(f"  Warning: Failed to fetch message body {uid}",
+                # Second pass: fetch and process messages in batches
+                fetch_items = FETCH_STRUCTURE_ITEMS if use_bodystructure else FETCH_ITEMS
+                fetch_stats = {'errors': 0}
+                fetched = fetch_messages(imap, messages_to_process, fetch_stats, fetch_items)
+                if pool:
+                    # Keep fetching while the workers parse
+                    fetched = prefetch(fetched, PIPELINE_QUEUE_SIZE)
+                try:
+                    for uid, message_info in analyze_fetched(
+                            report_progress(fetched, len(messages_to_process)), mailbox,
+                            use_bodystructure, seen_message_keys, stats, pool, workers):
+                        try:
+                            if loader:
+                                loader.add(message_info, scan_date)
+                            else:
+                                write_insert(out, message_info, scan_date)
+
+                            # Update statistics
+                            stats['total_messages'] += 1
+                            stats['new_messages'] += 1
+                            stats['total_body_bytes'] += message_info['body_length']
+                            stats['total_attachments'] += message_info['attachment_count']
+                            stats['total_attachment_bytes'] += message_info['attachment_total_size']
+
+                        except Exception as e:
+                            print(f"  Warning: Error processing message {uid}: {e}",
                                   file=sys.stderr)
                             stats['errors'] += 1
-                            continue
-
-                        # Extract the raw message
-                        if isinstance(body_data[0], tuple):
-                            raw_message = body_data[0][1]
-                        else:
-                            raw_message = body_data[0]
-
-                        # Parse message
-                        message_info = analyze_message(raw_message, mailbox, uid, flags,
-                                                      internal_date, rfc822_size)
-
-                        if not message_info:
-                            stats['errors'] += 1
-                            continue
-
-                        # Write INSERT statement
-                        out.write("INSERT INTO email_messages (mailbox, uid, message_id, flags, ")
-                        out.write("internal_date, rfc822_size, headers, body_length, ")
-                        out.write("attachment_count, attachment_total_size, scan_date)\n")
-                        out.write("VALUES (")
-                        out.write(f"{escape_sql_string(message_info['mailbox'])}, ")
-                        out.write(f"{escape_sql_string(message_info['uid'])}, ")
-                        out.write(f"{escape_sql_string(message_info['message_id'])}, ")
-                        out.write(f"{format_array_for_sql(message_info['flags'])}, ")
-                        if message_info['internal_date']:
-                            out.write(f"'{message_info['internal_date']}', ")
-                        else:
-                            out.write("NULL, ")
-                        if message_info['rfc822_size'] is not None:
-                            out.write(f"{message_info['rfc822_size']}, ")
-                        else:
-                            out.write("NULL, ")
-                        out.write(f"{format_json_for_sql(message_info['headers'])}::jsonb, ")
-                        out.write(f"{message_info['body_length']}, ")
-                        out.write(f"{message_info['attachment_count']}, ")
-                        out.write(f"{message_info['attachment_total_size']}, ")
-                        out.write(f"'{scan_date}'")
-                        out.write(");\n")
-
-                        # Update statistics
-                        stats['total_messages'] += 1
-                        stats['new_messages'] += 1
-                        stats['total_body_bytes'] += message_info['body_length']
-                        stats['total_attachments'] += message_info['attachment_count']
-                        stats['total_attachment_bytes'] += message_info['attachment_total_size']
-
-                    except Exception as e:
-                        print(f"  Warning: Error processing message {msg_id.decode()}: {e}",
-                              file=sys.stderr)
-                        stats['errors'] += 1
-                        continue
-
-                    # Progress indicator
-                    if idx % 100 == 0:
-                        print(f"  Processed {idx}/{len(messages_to_process)} messages...",
-                              file=sys.stderr)
+                finally:
+                    fetched.close()
+                    stats['errors'] += fetch_stats['errors']
 
                 print(f"  Completed: {len(messages_to_process)} messages processed",
                       file=sys.stderr)
@@ -930,8 +1575,11 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
                 stats['errors'] += 1
                 continue
 
-        # Write commit
-        out.write("\nCOMMIT;\n\n")
+        if loader:
+            loader.finish()
+        else:
+            # Write commit
+            out.write("\nCOMMIT;\n\n")
 
         # Write statistics as comments
         out.write("-- Scan Statistics\n")
@@ -950,6 +1598,8 @@ def scan_all_mailboxes(imap: imaplib.IMAP4,
         return stats
 
     finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
         if output_file:
             out.close()
 
@@ -1009,6 +1659,16 @@ Examples:
   # First incremental run (creates table automatically)
   %(prog)s -H localhost -u johnw --incremental --db-name maildb --db-user postgres -o initial.sql
 
+  # Quick scan - headers and BODYSTRUCTURE only, no message bodies
+  %(prog)s -H localhost -u johnw --bodystructure -o data.sql
+
+  # Parse on 4 cores while the IMAP connection keeps fetching
+  %(prog)s -H localhost -u johnw -j 4 -o data.sql
+
+  # Load directly into PostgreSQL with COPY (no psql step)
+  %(prog)s -H localhost -u johnw --load --db-name maildb --db-user postgres
+  %(prog)s -H localhost -u johnw --incremental --load --db-name maildb --db-user postgres
+
   # Scan only specific mailbox
   %(prog)s -H localhost -u johnw --limit-mailbox INBOX -o inbox.sql
 
@@ -1054,9 +1714,12 @@ Usage Notes:
                             help='Disable SSL/TLS (network mode, not recommended)')
 
     # Database options for incremental mode
-    db_group = parser.add_argument_group('PostgreSQL Database (for incremental mode)')
+    db_group = parser.add_argument_group('PostgreSQL Database (for incremental and load modes)')
     db_group.add_argument('--incremental', action='store_true',
                           help='Enable incremental mode (only process new messages)')
+    db_group.add_argument('--load', action='store_true',
+                          help='Load rows directly into the database with COPY instead of '
+                               'writing INSERT statements (upserts in incremental mode)')
     db_group.add_argument('--db-host', default=None,
                           help='Database host (default: from PGHOST or localhost)')
     db_group.add_argument('--db-port', type=int, default=None,
@@ -1074,22 +1737,32 @@ Usage Notes:
                               help='Output SQL file (default: stdout)')
     output_group.add_argument('--limit-mailbox',
                               help='Scan only this specific mailbox (default: scan all mailboxes)')
+    output_group.add_argument('-j', '--workers', type=int, default=1,
+                              help='Parse messages in this many processes while fetching '
+                                   'continues in the background (default: 1, parse inline)')
+    output_group.add_argument('--bodystructure', action='store_true',
+                              help='Download only headers, taking body and attachment sizes from '
+                                   'IMAP BODYSTRUCTURE (encoded sizes, e.g. base64 is ~4/3 larger)')
 
     args = parser.parse_args()
 
-    # Validate incremental mode requirements
-    if args.incremental:
+    if args.workers < 1:
+        print("Error: --workers must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    # Validate incremental and load mode requirements
+    if args.incremental or args.load:
         # Get database name from args or environment
         db_name = args.db_name or os.environ.get('PGDATABASE')
         db_user = args.db_user or os.environ.get('PGUSER')
 
         if not db_name:
-            print("Error: --db-name is required for incremental mode (or set PGDATABASE environment variable)",
+            print("Error: --db-name is required for incremental and load modes (or set PGDATABASE environment variable)",
                   file=sys.stderr)
             sys.exit(1)
 
         if not db_user:
-            print("Error: --db-user is required for incremental mode (or set PGUSER environment variable)",
+            print("Error: --db-user is required for incremental and load modes (or set PGUSER environment variable)",
                   file=sys.stderr)
             sys.exit(1)
 
@@ -1124,10 +1797,11 @@ Usage Notes:
         host = args.host
         username = args.username
 
-    # Connect to database if in incremental mode
+    # Connect to database if in incremental or load mode
     db_conn = None
-    if args.incremental:
-        print("\n=== Incremental Mode Enabled ===", file=sys.stderr)
+    if args.incremental or args.load:
+        if args.incremental:
+            print("\n=== Incremental Mode Enabled ===", file=sys.stderr)
         db_conn = connect_postgres(
             db_host=db_host,
             db_port=db_port,
@@ -1158,13 +1832,16 @@ Usage Notes:
             mailbox_names,
             args.output,
             incremental=args.incremental,
-            db_conn=db_conn
+            db_conn=db_conn,
+            use_bodystructure=args.bodystructure,
+            load=args.load,
+            workers=args.workers
         )
 
         # Print summary
         print_summary(stats, incremental=args.incremental)
 
-        if args.output:
+        if args.output and not args.load:
             print(f"\nSQL script written to: {args.output}", file=sys.stderr)
             print(f"Import with: psql -d {db_name if args.incremental else 'your_database'} -f {args.output}", file=sys.stderr)
 
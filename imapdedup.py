@@ -7,6 +7,7 @@
 #
 #  Default behaviour is purely to mark the duplicates as deleted.  Some mail clients
 #  will allow you to view these and undelete them if you change your mind.
+#  Only --move (with -y) removes them outright, from every mailbox processed.
 #
 #  Copyright (c) 2013-2022 Quentin Stafford-Fraser.
 #  All rights reserved, subject to the following:
@@ -35,10 +36,13 @@ import os
 import argparse
 import re
 import socket
+import sqlite3
 import sys
-from typing import List, Dict, Tuple, Optional, Type, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Tuple, Optional, Type, Any, Union, NamedTuple
 
-from email.parser import BytesParser
 from email.message import Message
 from email.errors import HeaderParseError
 from email.header import decode_header
@@ -48,6 +52,30 @@ from email.header import decode_header
 
 imaplib._MAXLINE = max(10_000_000, imaplib._MAXLINE)
 
+# The only headers dedup and its reports look at; fetching just these with
+# BODY.PEEK[HEADER.FIELDS] is a fraction of the full header block.
+DEDUP_HEADER_FIELDS = ("From", "To", "Cc", "Bcc", "Subject", "Date", "Message-ID")
+
+# UID FETCH batches are sized to return roughly this many bytes each, between
+# the given bounds; several batches are kept in flight to hide round trips.
+FETCH_TARGET_BYTES = 2 << 20
+FETCH_MIN_BATCH = 100
+FETCH_MAX_BATCH = 20_000
+FETCH_FIRST_BATCH = 1000
+FETCH_PIPELINE_DEPTH = 3
+
+# -c digest modes: one 128-bit blake2b kept as raw bytes, or the original
+# md5|sha256|sha3_256 hex concatenation (about ten times the key size).
+CHECKSUM_DIGESTS = ("blake2b", "legacy")
+CHECKSUM_HEADERS = ("From", "To", "Subject", "Date", "Cc", "Bcc")
+
+# A Message-ID header, or a -c digest of several headers
+MessageKey = Union[str, bytes]
+
+# Longest UID set sent in one STORE/COPY/MOVE; servers commonly cap command
+# lines at 8000 octets or more, and a run of consecutive UIDs costs one range.
+UID_SET_MAX_LENGTH = 7000
+
 class ImapDedupException(Exception):
     pass
 
@@ -127,6 +155,14 @@ def get_arguments(args: Optional[List[str]] = None) -> Tuple[argparse.Namespace,
         action="store_true",
         help="Include the Message-ID (if any) in the -c checksum.",
     )
+    parser.add_argument(
+        "--digest",
+        dest="checksum_digest",
+        choices=CHECKSUM_DIGESTS,
+        default="blake2b",
+        help="How -c hashes the headers: a single 128-bit blake2b (default), "
+             "or the md5+sha256+sha3_256 concatenation of earlier versions",
+    )
     parser.add_argument(
         "--no-close",
         dest="no_close",
@@ -162,6 +198,22 @@ def get_arguments(args: Optional[List[str]] = None) -> Tuple[argparse.Namespace,
         "-y", "--copy", dest="copy_mailbox", 
         help="Copy messages to specified mailbox before deleting them from current location."
     )
+    parser.add_argument(
+        "--move", dest="move", action="store_true",
+        help="With -y, move the duplicates instead of copying them and marking them deleted "
+             "(UID MOVE, or UID EXPUNGE of just those messages with UIDPLUS). They are removed "
+             "from every mailbox at once and cannot be undeleted there."
+    )
+    parser.add_argument(
+        "-C", "--cache", dest="cache_file",
+        help="SQLite file caching each message's ID (or checksum) by mailbox, "
+             "UIDVALIDITY and UID, so later runs only fetch headers of new messages"
+    )
+    parser.add_argument(
+        "-j", "--jobs", dest="jobs", type=int, default=1,
+        help="Number of IMAP connections scanning mailboxes concurrently "
+             "(duplicates are still resolved in mailbox order; default 1)"
+    )
     parser.add_argument('mailbox', nargs='*')
 
     options = parser.parse_args(args)
@@ -178,6 +230,14 @@ def get_arguments(args: Optional[List[str]] = None) -> Tuple[argparse.Namespace,
         sys.stderr.write("\nError: You can only specify one mailbox if you use -r.\n")
         sys.exit(1)
 
+    if options.jobs < 1:
+        sys.stderr.write("\nError: --jobs must be at least 1.\n")
+        sys.exit(1)
+
+    if options.move and (not options.copy_mailbox or options.tag_name):
+        sys.stderr.write("\nError: --move needs -y and cannot be used with -t.\n")
+        sys.exit(1)
+
     if options.use_id_in_checksum and not options.use_checksum:
         sys.stderr.write("\nError: If you use -m you must also use -c.\n")
         sys.exit(1)
@@ -213,52 +273,107 @@ def parse_list_response(line: bytes):
     return (flags, delimiter, mailbox_name)
 
 
-def str_header(parsed_message: Message, name: str) -> str:
+class HeaderFields(dict):
+    """
+    The fetched header fields of one message, standing in for the
+    email.message.Message that BytesParser would build.
+
+    Names are case-insensitive and the first instance of a header wins,
+    as with Message.get(); values are the raw (unfolded-as-received) text.
+    """
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return dict.get(self, name.lower(), default)
+
+    def __getitem__(self, name: str) -> Optional[str]:
+        return dict.get(self, name.lower())
+
+
+def parse_header_fields(raw: bytes) -> HeaderFields:
+    """
+    Lightweight replacement for BytesParser().parsebytes() on a header block.
+
+    Produces the same values the compat32 parser would: text after the
+    colon with leading blanks removed, continuation lines appended
+    verbatim, the trailing line break dropped, and bytes decoded as ASCII
+    with surrogateescape.
+    """
+    fields = HeaderFields()
+    name = None
+    value: List[str] = []
+
+    def finish():
+        if name is not None and name not in fields:
+            dict.__setitem__(fields, name, "".join(value).rstrip("\r\n"))
+
+    for line in raw.decode("ascii", "surrogateescape").splitlines(keepends=True):
+        if line[0] in " \t":
+            if name is not None:
+                value.append(line)
+            continue
+        if not line.strip():
+            break
+        finish()
+        header, sep, rest = line.partition(":")
+        if not sep:
+            name = None
+            continue
+        name = header.lower()
+        value = [rest.lstrip(" \t")]
+    finish()
+    return fields
+
+
+def str_header(parsed_message: Union[Message, HeaderFields], name: str) -> str:
     """"
     Return the value (of the first instance, if more than one) of
     the given header, as a unicode string.
     """
-    hdrlist = decode_header(parsed_message.get(name, ""))
+    value = parsed_message.get(name, "")
+    if isinstance(value, str) and not value.isascii():
+        # 8-bit header: Message.get() would wrap it as unknown-8bit
+        return value.encode("ascii", "surrogateescape").decode("utf-8", "ignore").lstrip()
+    hdrlist = decode_header(value)
     btext, charset = hdrlist[0]
     text = btext if isinstance(btext, str) else btext.decode("utf-8", "ignore")
     return text.lstrip()
 
 
+def header_checksum(data: bytes, digest: str = "blake2b") -> MessageKey:
+    """
+    Digest the concatenated header lines for -c, in the given mode.
+    """
+    if digest == "blake2b":
+        return hashlib.blake2b(data, digest_size=16).digest()
+    return "|".join(
+        hashlib.new(name, data).hexdigest() for name in ("md5", "sha256", "sha3_256")
+    )
+
+
 def get_message_id(
-    parsed_message: Message, options_use_checksum=False, options_use_id_in_checksum=False
-) -> Optional[str]:
+    parsed_message: Union[Message, HeaderFields], options_use_checksum=False,
+    options_use_id_in_checksum=False, digest: str = "blake2b"
+) -> Optional[MessageKey]:
     """
     Normally, return the Message-ID header (or print a warning if it doesn't
     exist and return None).
 
-    If options_use_checksum is specified, use md5 hash of several headers
-    instead.
+    If options_use_checksum is specified, use a digest of several headers
+    instead: 16 raw bytes of blake2b, or with digest="legacy" the hex md5,
+    sha256 and sha3_256 of earlier versions joined by "|".
 
     For more safety, user should first do a dry run, reviewing them before
-    deletion. Problems are extremely unlikely, but md5 is not collision-free.
+    deletion. Problems are extremely unlikely, but no digest is collision-free.
 
     If options_use_id_in_checksum is specified, then the Message-ID will be
     included in the header checksum, otherwise it is excluded.
     """
     try:
         if options_use_checksum:
-            md5 = hashlib.md5()
-            sha = hashlib.sha256()
-            sha3 = hashlib.sha3_256()
-            def update(x):
-                md5.update(x)
-                sha.update(x)
-                sha3.update(x)
-            update(("From:" + str_header(parsed_message, "From")).encode())
-            update(("To:" + str_header(parsed_message, "To")).encode())
-            update(("Subject:" + str_header(parsed_message, "Subject")).encode())
-            update(("Date:" + str_header(parsed_message, "Date")).encode())
-            update(("Cc:" + str_header(parsed_message, "Cc")).encode())
-            update(("Bcc:" + str_header(parsed_message, "Bcc")).encode())
-            if options_use_id_in_checksum:
-                update(("Message-ID:" + str_header(parsed_message, "Message-ID")).encode())
-            msg_id = md5.hexdigest() + "|" + sha.hexdigest() + "|" + sha3.hexdigest()
-            # print(msg_id)
+            names = CHECKSUM_HEADERS + (("Message-ID",) if options_use_id_in_checksum else ())
+            # Hash all the headers in one call rather than one update() each
+            data = "".join(name + ":" + str_header(parsed_message, name) for name in names)
+            return header_checksum(data.encode(), digest)
         else:
             msg_id = str_header(parsed_message, "Message-ID")
             if not msg_id:
@@ -294,6 +409,91 @@ def get_message_id(
         return None
 
 
+class MessageIdCache:
+    """
+    On-disk map of (account, mailbox, UID) to the ID dedup computed for it.
+
+    A mailbox's rows are only trusted while its UIDVALIDITY and the ID
+    mode (Message-ID, -c or -c -m) match those they were recorded with;
+    otherwise they are dropped and the mailbox is read afresh.  Messages
+    without a usable ID are stored as NULL so they are not fetched again.
+    """
+
+    def __init__(self, path: str, account: str, mode: str):
+        self.account = account
+        self.mode = mode
+        # Shared by the --jobs scanning threads, one statement at a time
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS mailboxes (
+                account     TEXT NOT NULL,
+                mailbox     TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                mode        TEXT NOT NULL,
+                PRIMARY KEY (account, mailbox)
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                mailbox TEXT NOT NULL,
+                uid     INTEGER NOT NULL,
+                msg_id  TEXT,
+                PRIMARY KEY (account, mailbox, uid)
+            );
+        """)
+
+    def lookup(self, mailbox: str, uidvalidity: int) -> Dict[int, Optional[MessageKey]]:
+        """
+        Return the cached {uid: msg_id} of a mailbox, discarding it if stale.
+
+        Checksums are stored as BLOBs and so come back as bytes, like new ones.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT uidvalidity, mode FROM mailboxes WHERE account = ? AND mailbox = ?",
+                (self.account, mailbox)
+            ).fetchone()
+            if row != (uidvalidity, self.mode):
+                with self.db:
+                    self.db.execute("DELETE FROM messages WHERE account = ? AND mailbox = ?",
+                                    (self.account, mailbox))
+                    self.db.execute("INSERT OR REPLACE INTO mailboxes VALUES (?, ?, ?, ?)",
+                                    (self.account, mailbox, uidvalidity, self.mode))
+                return {}
+            return dict(self.db.execute(
+                "SELECT uid, msg_id FROM messages WHERE account = ? AND mailbox = ?",
+                (self.account, mailbox)
+            ))
+
+    def update(self, mailbox: str, new_ids: Dict[int, Optional[MessageKey]],
+               gone: List[int]) -> None:
+        """
+        Record IDs of newly fetched messages and forget UIDs no longer present.
+        """
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?)",
+                ((self.account, mailbox, uid, msg_id) for uid, msg_id in new_ids.items())
+            )
+            self.db.executemany(
+                "DELETE FROM messages WHERE account = ? AND mailbox = ? AND uid = ?",
+                ((self.account, mailbox, uid) for uid in gone)
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def get_uidvalidity(server: imaplib.IMAP4) -> Optional[int]:
+    """
+    Return the UIDVALIDITY reported by the last SELECT, if any.
+    """
+    _, data = server.response("UIDVALIDITY")
+    if data and data[0]:
+        return int(data[-1])
+    return None
+
+
 def get_mailbox_list(server: imaplib.IMAP4, directory: str = '""', pattern: str = '"*"') -> List[str]:
     """
     Return a list of usable mailbox names which match the pattern.
@@ -310,13 +510,13 @@ def get_mailbox_list(server: imaplib.IMAP4, directory: str = '""', pattern: str
 
 def get_matching_msgnums(server: imaplib.IMAP4, query: str, sent_before: Optional[str]) -> List[int]:
     """
-    Return a list of ids of deleted messages in the folder.
+    Return a list of UIDs of matching messages in the folder.
     """
     resp = []
     if (sent_before is not None):
         query = f"{query} SENTBEFORE {sent_before}"
         print(f"Getting matching messages sent before {sent_before}")
-    deleted_info = check_response(server.search(None, query))
+    deleted_info = check_response(server.uid("SEARCH", query))
     if deleted_info and deleted_info[0]:   
         # If neither None nor empty nor [None], then
         # the first item should be a list of msg ids
@@ -342,40 +542,262 @@ def get_tagged_msgnums(server: imaplib.IMAP4, tag_name: str, sent_before: Option
     return get_matching_msgnums(server, f"KEYWORD {tag_name}", sent_before)
 
 
-def process_messages(server: imaplib.IMAP4, msgs_to_delete: List[int], tag_name: Optional[str] = None, copy_mailbox: Optional[str] = None):
+def uid_sequence_set(uids: List[int]) -> str:
+    """
+    Compress UIDs into an IMAP sequence set, e.g. [1, 2, 3, 5] -> "1:3,5".
+    """
+    return ",".join(iter_uid_ranges(uids))
+
+
+def iter_uid_ranges(uids: List[int]) -> Iterator[str]:
+    """
+    Yield the "lo:hi" (or single "n") runs of the sorted, distinct UIDs.
+    """
+    run: List[int] = []
+    for uid in sorted(set(uids)):
+        if run and uid == run[1] + 1:
+            run[1] = uid
+            continue
+        if run:
+            yield str(run[0]) if run[0] == run[1] else f"{run[0]}:{run[1]}"
+        run = [uid, uid]
+    if run:
+        yield str(run[0]) if run[0] == run[1] else f"{run[0]}:{run[1]}"
+
+
+def iter_uid_sets(uids: List[int], max_length: int = UID_SET_MAX_LENGTH) -> Iterator[str]:
+    """
+    Split UIDs into compact sequence sets no longer than max_length each.
+    """
+    batch: List[str] = []
+    length = 0
+    for item in iter_uid_ranges(uids):
+        if batch and length + 1 + len(item) > max_length:
+            yield ",".join(batch)
+            batch, length = [], 0
+        length += len(item) + bool(batch)
+        batch.append(item)
+    if batch:
+        yield ",".join(batch)
+
+
+def parse_sequence_set(spec: Union[str, bytes]) -> List[int]:
+    """
+    Expand an IMAP sequence set such as "1:3,5" (without "*") into UIDs.
+    """
+    if isinstance(spec, bytes):
+        spec = spec.decode()
+    uids: List[int] = []
+    for part in spec.split(","):
+        lo, _, hi = part.partition(":")
+        lo_n, hi_n = int(lo), int(hi or lo)
+        uids.extend(range(min(lo_n, hi_n), max(lo_n, hi_n) + 1))
+    return uids
+
+
+def count_stored(data: List[Any], flag: str) -> int:
+    """
+    Count the messages a UID STORE reported, in its FETCH responses, as now having flag.
+    """
+    flag_bytes = flag.encode().lower()
+    count = 0
+    for item in data:
+        if isinstance(item, tuple):
+            item = item[0]
+        if item and fetch_uid_pattern.search(item):
+            flags = re.search(rb"\bFLAGS \(([^)]*)\)", item)
+            if flags and flag_bytes in flags.group(1).lower().split():
+                count += 1
+    return count
+
+
+def count_copied(server: imaplib.IMAP4, data: List[Any]) -> Optional[int]:
     """
-    Actually do whatever we want to do to duplicates.
+    Count, and clear, the source UIDs of the COPYUID response codes of a
+    UID COPY (in its tagged reply, data) or UID MOVE (in an untagged OK).
+    None if the server sent none, as it doesn't without UIDPLUS.
+    """
+    _, codes = server.response("COPYUID")
+    codes = [code for code in codes if code is not None]
+    for item in data:
+        if isinstance(item, bytes):
+            m = re.search(rb"\[COPYUID (\d+ [\d:,]+ [\d:,]+)\]", item)
+            if m:
+                codes.append(m.group(1))
+    if not codes:
+        return None
+    return sum(len(parse_sequence_set(code.split()[1])) for code in codes)
+
+
+def count_expunged(server: imaplib.IMAP4) -> int:
+    """
+    Count, and clear, the EXPUNGE responses received since the last call.
+    """
+    _, data = server.response("EXPUNGE")
+    return sum(1 for item in data if item is not None)
+
+
+def process_messages(server: imaplib.IMAP4, msgs_to_delete: List[int], tag_name: Optional[str] = None,
+                     copy_mailbox: Optional[str] = None, move: bool = False) -> Tuple[int, int]:
+    r"""
+    Actually do whatever we want to do to duplicates (given by UID).
     Tag them with (\Deleted) or the specified tag_name.
     Copy them to another mailbox first if copy_mailbox specified.
+
+    If move is set (--move), copied messages are removed right away:
+    with UID MOVE if the server offers it, or by copying, deleting and
+    UID EXPUNGE-ing just these UIDs with UIDPLUS.  Without either they
+    are only copied and marked deleted.
+
+    Returns how many messages were copied and how many were flagged
+    (or, when moving, removed), as reported by the server's responses.
     """
-    message_ids = ",".join(map(str, msgs_to_delete))
-    action = tag_name or r"(\Deleted)"
-    if copy_mailbox:
-        check_response(
-            server.copy(message_ids, copy_mailbox)
-        )
-    check_response(
-        server.store(message_ids, "+FLAGS", action)
-    )
+    flag = tag_name or r"\Deleted"
+    capabilities = server.capabilities
+    move = bool(move and copy_mailbox and not tag_name)
+    copied = changed = 0
+    for uid_set in iter_uid_sets(msgs_to_delete):
+        count_expunged(server)  # Forget any stale expunge and COPYUID notices
+        count_copied(server, [])
+        if move and "MOVE" in capabilities:
+            data = check_response(server.uid("MOVE", uid_set, copy_mailbox))
+            moved = count_expunged(server)
+            # Every message MOVE expunges was copied, even without COPYUID
+            copied += count_copied(server, data) or moved
+            changed += moved
+            continue
+        if copy_mailbox:
+            data = check_response(server.uid("COPY", uid_set, copy_mailbox))
+            confirmed = count_copied(server, data)
+            if confirmed is None:
+                # No COPYUID without UIDPLUS; COPY is all or nothing, so success
+                # means every message of the batch still present was copied
+                confirmed = len(parse_sequence_set(uid_set))
+            copied += confirmed
+        stored = count_stored(check_response(server.uid("STORE", uid_set, "+FLAGS", f"({flag})")), flag)
+        if move and "UIDPLUS" in capabilities:
+            check_response(server.uid("EXPUNGE", uid_set))
+            stored = count_expunged(server)
+        changed += stored
+    return copied, changed
+
+
+fetch_uid_pattern = re.compile(rb"\bUID (\d+)")
+
+
+def parse_fetch_response(data: List[Any]) -> Iterator[Tuple[int, bytes]]:
+    """
+    Pull (uid, literal) pairs out of the untagged FETCH data imaplib collects.
 
+    Each message with a body section arrives as a (prefix, literal) tuple
+    followed by the closing bytes; the UID item usually precedes the
+    literal but may follow it, so both places are checked.  Bare entries
+    (e.g. unsolicited FLAGS updates) are skipped.
+    """
+    pending: Optional[bytes] = None
+    for item in data:
+        if isinstance(item, tuple):
+            prefix, literal = item
+            m = fetch_uid_pattern.search(prefix)
+            if m:
+                yield int(m.group(1)), literal
+                pending = None
+            else:
+                pending = literal
+        elif isinstance(item, bytes) and pending is not None:
+            m = fetch_uid_pattern.search(item)
+            if m:
+                yield int(m.group(1)), pending
+            pending = None
 
-def get_msg_headers(server: imaplib.IMAP4, msg_ids: List[int]) -> List[Tuple[int, bytes]]:
+
+class FetchPipeline:
     """
-    Get the dict of headers for each message in the list of provided IDs.
-    Return a list of tuples:  [ (msgid, header_bytes), (msgid, header_bytes)... ]
-    The returned header_bytes can be parsed by 
+    Keeps up to `depth` UID FETCH commands in flight on one connection.
+
+    imaplib waits for each reply before returning, so pipelining goes
+    through its undocumented _command, _command_complete and
+    _untagged_response methods, and only here.  If this imaplib lacks
+    any of them, commands are sent one at a time with server.uid().
     """
-    # Get the header info for each message
-    message_ids_str = ",".join(map(str, msg_ids))
-    ms = check_response(server.fetch(message_ids_str, "(RFC822.HEADER)"))
 
-    # There are two lines per message in the response
-    resp: List[Tuple[int, bytes]] = []
-    for ci in range(len(ms) // 2):
-        mnum = int(msg_ids[ci])
-        _, hinfo = ms[ci * 2]
-        resp.append((mnum, hinfo))
-    return resp
+    PRIVATE_METHODS = ("_command", "_command_complete", "_untagged_response")
+
+    def __init__(self, server: imaplib.IMAP4, depth: int):
+        self.server = server
+        supported = all(callable(getattr(server, name, None)) for name in self.PRIVATE_METHODS)
+        self.depth = depth if supported else 1
+
+    def send(self, uid_set: str, items: str) -> Any:
+        """Issue UID FETCH (at depth 1, only when its result is asked for)."""
+        if self.depth == 1:
+            return uid_set, items
+        return self.server._command("UID", "FETCH", uid_set, items)
+
+    def result(self, sent: Any) -> List[Any]:
+        """Wait for a command issued by send(), returning the FETCH data read so far."""
+        if self.depth == 1:
+            return check_response(self.server.uid("FETCH", *sent))
+        typ, dat = self.server._command_complete("UID", sent)
+        check_response((typ, dat))
+        _, data = self.server._untagged_response(typ, dat, "FETCH")
+        return data
+
+
+def fetch_msg_headers(
+    server: imaplib.IMAP4, uids: List[int], fields=DEDUP_HEADER_FIELDS,
+    depth: int = FETCH_PIPELINE_DEPTH, verbose: bool = False
+) -> Iterator[Tuple[int, bytes]]:
+    """
+    Fetch selected header fields of the given UIDs, yielding (uid, header_bytes)
+    in the order of uids.
+
+    Requests are UID FETCH ... BODY.PEEK[HEADER.FIELDS (...)] over batches
+    whose size adapts so each response is about FETCH_TARGET_BYTES, with up
+    to `depth` requests in flight at once (see FetchPipeline).
+    """
+    items = "(UID BODY.PEEK[HEADER.FIELDS (%s)])" % " ".join(f.upper() for f in fields)
+    pipeline = FetchPipeline(server, depth)
+    batch_size = FETCH_FIRST_BATCH
+    in_flight: List[Tuple[Any, List[int]]] = []
+    received: Dict[int, bytes] = {}
+    start = 0
+
+    while start < len(uids) or in_flight:
+        while start < len(uids) and len(in_flight) < pipeline.depth:
+            batch = uids[start: start + batch_size]
+            start += len(batch)
+            in_flight.append((pipeline.send(uid_sequence_set(batch), items), batch))
+
+        sent, batch = in_flight.pop(0)
+        began = time.monotonic()
+        data = pipeline.result(sent)
+        nbytes = 0
+        for uid, header in parse_fetch_response(data):
+            received[uid] = header
+            nbytes += len(header)
+
+        # Untagged data of later batches may already have been read
+        for uid in batch:
+            if uid in received:
+                yield uid, received.pop(uid)
+
+        if nbytes:
+            per_message = nbytes / len(batch)
+            batch_size = int(min(FETCH_MAX_BATCH, max(FETCH_MIN_BATCH,
+                                                      FETCH_TARGET_BYTES / per_message)))
+        if verbose:
+            print("Fetched %d headers (%d bytes) in %.2fs; next batch %d"
+                  % (len(batch), nbytes, time.monotonic() - began, batch_size))
+
+
+def get_msg_headers(server: imaplib.IMAP4, msg_ids: List[int]) -> List[Tuple[int, bytes]]:
+    """
+    Get the dedup header fields for each message in the list of provided UIDs.
+    Return a list of tuples:  [ (uid, header_bytes), (uid, header_bytes)... ]
+    The returned header_bytes can be parsed by parse_header_fields.
+    """
+    return list(fetch_msg_headers(server, msg_ids, depth=1))
 
 
 def print_message_info(parsed_message: Message):
@@ -395,7 +817,10 @@ def add_quotes(mbox: str) -> str:
 
 
 # This actually does the work
-def process(options, mboxes: List[str]):
+def connect(options) -> imaplib.IMAP4:
+    """
+    Open and authenticate a connection as described by the options.
+    """
     serverclass: Type[Any]
     if options.process:
         serverclass = imaplib.IMAP4_stream
@@ -445,6 +870,124 @@ def process(options, mboxes: List[str]):
         sys.stderr.write("\nError: Login failed\n")
         sys.exit(1)
 
+    return server
+
+
+class MailboxScan(NamedTuple):
+    """
+    The IDs read from one mailbox, before duplicates are resolved.
+    """
+    mbox: str
+    total: int
+    numdeleted: int
+    uids: List[int]                 # Undeleted UIDs in server order
+    ids: Dict[int, Optional[MessageKey]]  # Their message IDs, None if unusable
+    num_cached: int
+    headers: Dict[int, HeaderFields]  # Parsed header fields, kept only when verbose
+
+
+def scan_mailbox(server: imaplib.IMAP4, mbox: str, options,
+                 cache: Optional[MessageIdCache] = None) -> MailboxScan:
+    """
+    Select a mailbox and work out the message ID of each undeleted message.
+
+    This only reads, so several connections may scan different mailboxes
+    at once; deciding which messages are duplicates is left to the caller.
+    """
+    msgs = check_response(server.select(mailbox=mbox, readonly=options.dry_run))[0]
+    uidvalidity = get_uidvalidity(server)
+
+    # Check how many messages are already marked 'deleted'...
+    numdeleted = len(get_deleted_msgnums(server, options.sent_before))
+
+    # Now get a list of the ones that aren't deleted.
+    # That's what we'll actually use.
+    msgnums = get_undeleted_msgnums(server, options.sent_before)
+
+    # IDs already known from earlier runs need not be fetched again
+    cached: Dict[int, Optional[MessageKey]] = {}
+    if cache is not None and uidvalidity is not None:
+        cached = cache.lookup(mbox, uidvalidity)
+    to_fetch = [uid for uid in msgnums if uid not in cached]
+
+    if options.verbose:
+        print("Reading %d message(s) in %s... (in adaptive batches of about %d KiB)"
+              % (len(to_fetch), mbox, FETCH_TARGET_BYTES >> 10))
+
+    # Fetch just the fields we need, and parse them.
+    headers: Dict[int, HeaderFields] = {}
+    new_ids: Dict[int, Optional[MessageKey]] = {}
+    for mnum, hinfo in fetch_msg_headers(server, to_fetch, verbose=options.verbose):
+        # Parse the header fields into a Message-like dict
+        mp = parse_header_fields(hinfo)
+
+        if options.verbose:
+            print(f"Checking {mbox} message {mnum}")
+            # Store message only when verbose is enabled (to print it later on)
+            headers[mnum] = mp
+
+        # Record the message-ID header (or generate one from other headers)
+        new_ids[mnum] = get_message_id(
+            mp, options.use_checksum, options.use_id_in_checksum, options.checksum_digest
+        )
+
+    if cache is not None and uidvalidity is not None:
+        # A SENTBEFORE search only sees part of the mailbox
+        current = set(msgnums)
+        gone = [uid for uid in cached if uid not in current] \
+            if options.sent_before is None else []
+        cache.update(mbox, new_ids, gone)
+
+    ids = {}
+    for mnum in msgnums:
+        if mnum in new_ids:
+            ids[mnum] = new_ids[mnum]
+        elif mnum in cached:
+            ids[mnum] = cached[mnum]
+        # Otherwise it was expunged while we were fetching
+    return MailboxScan(mbox, int(msgs), numdeleted, list(ids), ids,
+                       len(msgnums) - len(to_fetch), headers)
+
+
+def iter_scans(server: imaplib.IMAP4, mboxes: List[str], options,
+               cache: Optional[MessageIdCache]) -> Iterator[MailboxScan]:
+    """
+    Scan mailboxes, yielding results in mailbox order.
+
+    With more than one job, a pool of extra connections scans ahead while
+    the caller acts on earlier mailboxes over the main connection.
+    """
+    if options.jobs == 1:
+        for mbox in mboxes:
+            yield scan_mailbox(server, mbox, options, cache)
+        return
+
+    local = threading.local()
+    connections: List[imaplib.IMAP4] = []
+    connections_lock = threading.Lock()
+
+    def scan(mbox: str) -> MailboxScan:
+        if not hasattr(local, "server"):
+            local.server = connect(options)
+            with connections_lock:
+                connections.append(local.server)
+        return scan_mailbox(local.server, mbox, options, cache)
+
+    executor = ThreadPoolExecutor(max_workers=min(options.jobs, len(mboxes)))
+    try:
+        yield from executor.map(scan, mboxes)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        for conn in connections:
+            try:
+                conn.logout()
+            except (imaplib.IMAP4.error, OSError):
+                pass
+
+
+def process(options, mboxes: List[str]):
+    server = connect(options)
+
     # List mailboxes option
     # Just do that and then exit
     if options.just_list:
@@ -475,78 +1018,73 @@ def process(options, mboxes: List[str]):
     if len(mboxes) > 1:
         print("Working with mailboxes in order: %s" % (", ".join(mboxes)))
 
+    cache = None
+    if options.cache_file:
+        account = options.process or f"{options.user}@{options.server}:{options.port or ''}"
+        mode = "message-id"
+        if options.use_checksum:
+            mode = f"checksum-{options.checksum_digest}" + ("+id" if options.use_id_in_checksum else "")
+        cache = MessageIdCache(options.cache_file, account, mode)
+
+    # Make sure mailbox names are surrounded by quotes if they contain a space
+    mboxes = [add_quotes(mbox) for mbox in mboxes]
+
     # OK - let's get started.
     # Iterate through a set of named mailboxes and delete the later messages discovered.
     try:
-        parser = BytesParser()  # can be the same for all mailboxes
         # Create a list of previously seen message IDs, in any mailbox
-        msg_ids: Dict[str, str] = {}
-        for mbox in mboxes:
+        msg_ids: Dict[MessageKey, str] = {}
+        for scan in iter_scans(server, mboxes, options, cache):
+            mbox = scan.mbox
             msgs_to_delete = []  # should be reset for each mbox
-            msg_map = {}  # should be reset for each mbox
-
-            # Make sure mailbox name is surrounded by quotes if it contains a space
-            mbox = add_quotes(mbox)
-
-            # Select the mailbox
-            msgs = check_response(server.select(mailbox=mbox, readonly=options.dry_run))[0]
-            print("There are %d messages in %s." % (int(msgs), mbox))
-
-            # Check how many messages are already marked 'deleted'...
-            numdeleted = len(get_deleted_msgnums(server, options.sent_before))
-            print(f'{numdeleted or "No"} message(s) currently marked as deleted in {mbox}')
-
-            # Now get a list of the ones that aren't deleted. 
-            # That's what we'll actually use.
-            msgnums = get_undeleted_msgnums(server, options.sent_before)
-            print(f"{len(msgnums)} others in {mbox}")
-
-            chunkSize = 100
-            if options.verbose:
-                print("Reading the others... (in batches of %d)" % chunkSize)
-
-            for i in range(0, len(msgnums), chunkSize):
-                if options.verbose:
-                    print("Batch starting at item %d" % i)
-
-                # and parse them.
-                for mnum, hinfo in get_msg_headers(server, msgnums[i: i + chunkSize]):
-                    # Parse the header info into a Message object
-                    mp = parser.parsebytes(hinfo)
-
-                    if options.verbose:
-                        print(f"Checking {mbox} message {mnum}")
-                        # Store message only when verbose is enabled (to print it later on)
-                        msg_map[mnum] = mp
-
-                    # Record the message-ID header (or generate one from other headers)
-                    msg_id = get_message_id(
-                        mp, options.use_checksum, options.use_id_in_checksum
-                    )
-
-                    if msg_id:
-                        # If we've seen this message before, record it as one to be
-                        # deleted in this mailbox.
-                        if msg_id in msg_ids:
+            msg_map = scan.headers  # should be reset for each mbox
+
+            print("There are %d messages in %s." % (scan.total, mbox))
+            print(f'{scan.numdeleted or "No"} message(s) currently marked as deleted in {mbox}')
+            print(f"{len(scan.uids)} others in {mbox}")
+            if cache is not None:
+                print(f"{scan.num_cached} message ID(s) cached, "
+                      f"fetched {len(scan.uids) - scan.num_cached} in {mbox}")
+
+            if options.jobs > 1:
+                # Scanned over another connection; select it here to act on it
+                check_response(server.select(mailbox=mbox, readonly=options.dry_run))
+
+            processed = 0
+            for mnum in scan.uids:
+                msg_id = scan.ids[mnum]
+                if msg_id:
+                    # If we've seen this message before, record it as one to be
+                    # deleted in this mailbox.
+                    if msg_id in msg_ids:
+                        print(
+                            "Message %s_%s is a duplicate of %s and %s be %s"
+                            % (
+                                mbox, mnum, msg_ids[msg_id],
+                                options.dry_run and "would" or "will",
+                                "tagged as '%s'" % options.tag_name if options.tag_name else "marked as deleted",
+                            ) 
+                        )
+                        if options.show or options.verbose:
+                            if mnum not in msg_map:
+                                # Cached ID: fetch the headers just for this report
+                                for _, hinfo in get_msg_headers(server, [mnum]):
+                                    msg_map[mnum] = parse_header_fields(hinfo)
+                            mp = msg_map.get(mnum, HeaderFields())
                             print(
-                                "Message %s_%s is a duplicate of %s and %s be %s"
-                                % (
-                                    mbox, mnum, msg_ids[msg_id],
-                                    options.dry_run and "would" or "will",
-                                    "tagged as '%s'" % options.tag_name if options.tag_name else "marked as deleted",
-                                ) 
+                                "Subject: %s\nFrom: %s\nDate: %s\n"
+                                % (mp["Subject"], mp["From"], mp["Date"])
                             )
-                            if options.show or options.verbose:
-                                print(
-                                    "Subject: %s\nFrom: %s\nDate: %s\n"
-                                    % (mp["Subject"], mp["From"], mp["Date"])
-                                )
-                            msgs_to_delete.append(mnum)
-                        # Otherwise just record the fact that we've seen it
-                        else:
-                            msg_ids[msg_id] = f"{mbox}_{mnum}"
+                        msgs_to_delete.append(mnum)
+                    # Otherwise just record the fact that we've seen it
+                    else:
+                        msg_ids[msg_id] = f"{mbox}_{mnum}"
 
-                print(f"{min(len(msgnums), i + chunkSize)} message(s) in {mbox} processed")
+                processed += 1
+                if processed % 10_000 == 0:
+                    print(f"{processed} message(s) in {mbox} processed")
+
+            print(f"{processed} message(s) in {mbox} processed")
 
             # OK - we've been through this mailbox, and msgs_to_delete holds
             # a list of the duplicates we've found.
@@ -571,34 +1109,37 @@ def process(options, mboxes: List[str]):
                     )
 
                 else:
-                    if options.copy_mailbox:
-                        print("Copying %i messages to '%s'..." % (len(msgs_to_delete), options.copy_mailbox))
-                    if options.tag_name:
-                        print("Tagging %i messages as '%s'..." % (len(msgs_to_delete), options.tag_name))
+                    # Without MOVE or UIDPLUS, --move can only copy and mark deleted
+                    move = options.move and ("MOVE" in server.capabilities
+                                             or "UIDPLUS" in server.capabilities)
+                    if move:
+                        print("Moving %i messages to '%s'..." % (len(msgs_to_delete), options.copy_mailbox))
                     else:
-                        print("Marking %i messages as deleted..." % (len(msgs_to_delete)))
-                    # Deleting messages one at a time can be slow if there are many,
-                    # so we batch them up.
-                    chunkSize = 30
-                    if options.verbose:
-                        print("(in batches of %d)" % chunkSize)
-                    for i in range(0, len(msgs_to_delete), chunkSize):
-                        process_messages(server, msgs_to_delete[i: i + chunkSize], options.tag_name, options.copy_mailbox)
-                        if options.verbose:
-                            print("Batch starting at item %d marked." % i)
-                    print("Confirming new numbers...")
-                    numdeleted = len(get_deleted_msgnums(server, options.sent_before))
-                    numundel = len(get_undeleted_msgnums(server, options.sent_before))
-                    print(
-                        "There are now %s messages marked as deleted and %s others in %s."
-                        % (numdeleted, numundel, mbox)
+                        if options.copy_mailbox:
+                            print("Copying %i messages to '%s'..." % (len(msgs_to_delete), options.copy_mailbox))
+                        if options.tag_name:
+                            print("Tagging %i messages as '%s'..." % (len(msgs_to_delete), options.tag_name))
+                        else:
+                            print("Marking %i messages as deleted..." % (len(msgs_to_delete)))
+                    # Consecutive UIDs collapse into ranges, so each command
+                    # can cover thousands of messages.
+                    copied, changed = process_messages(
+                        server, msgs_to_delete, options.tag_name, options.copy_mailbox,
+                        move=move
                     )
-                    if options.tag_name:
-                        numtagged = len(get_tagged_msgnums(server, options.tag_name, options.sent_before))
+                    if options.copy_mailbox:
+                        print("%d messages copied to '%s'." % (copied, options.copy_mailbox))
+                    if move:
+                        print("%d of %d messages removed from %s." % (changed, len(msgs_to_delete), mbox))
+                    else:
                         print(
-                        "There are now %s messages tagged as '%s' in %s."
-                        % (numtagged, options.tag_name, mbox)
-                    )
+                            "%d of %d messages now %s in %s."
+                            % (
+                                changed, len(msgs_to_delete),
+                                "tagged as '%s'" % options.tag_name if options.tag_name else "marked as deleted",
+                                mbox,
+                            )
+                        )
 
         if not options.no_close:
             server.close()
@@ -606,6 +1147,8 @@ def process(options, mboxes: List[str]):
     except ImapDedupException as e:
         print("Error:", e, file=sys.stderr)
     finally:
+        if cache is not None:
+            cache.close()
         server.logout()
 
 if __name__ == "__main__":
@@ -0,0 +1,559 @@
+import hashlib
+import importlib.machinery
+import importlib.util
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+
+SCRIPT = Path(__file__).with_name("checksum")
+
+
+def load_checksum():
+    loader = importlib.machinery.SourceFileLoader("checksum_under_test", str(SCRIPT))
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    assert spec is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[loader.name] = module
+    loader.exec_module(module)
+    return module
+
+
+checksum = load_checksum()
+
+
+def run_cli(cwd: Path, *args: object) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, str(SCRIPT), *(str(arg) for arg in args)],
+        cwd=cwd,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+
+
+def make_tree(root: Path, files: dict[str, bytes]) -> None:
+    for name, data in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+@pytest.mark.parametrize(
+    ("value", "seconds"),
+    [("90", 90.0), ("12h", 43200.0), ("30d", 2592000.0), ("2w", 1209600.0), ("1.5m", 90.0)],
+)
+def test_parse_duration(value: str, seconds: float) -> None:
+    assert checksum.parse_duration(value) == seconds
+
+
+def test_parse_duration_rejects_garbage() -> None:
+    with pytest.raises(Exception):
+        checksum.parse_duration("soon")
+
+
+def test_cache_skips_unchanged_files_and_rehashes_changed(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta"})
+    assert run_cli(tmp_path, "--algo", "sha256", "a", "b").returncode == 0
+
+    first = run_cli(tmp_path, "--check", "--cache")
+    assert first.returncode == 0
+    assert "2 verified, 0 cached-verified" in first.stdout
+
+    second = run_cli(tmp_path, "--check", "--cache")
+    assert "0 verified, 2 cached-verified" in second.stdout
+
+    (tmp_path / "a").write_bytes(b"tampered")
+    third = run_cli(tmp_path, "--check", "--cache")
+    assert third.returncode == 1
+    assert "a: Checksum MISMATCH!" in third.stdout
+    assert "1 cached-verified" in third.stdout
+
+
+def test_cache_deep_forces_rehash(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha"})
+    run_cli(tmp_path, "--algo", "sha256", "a")
+    run_cli(tmp_path, "--check", "--cache")
+
+    deep = run_cli(tmp_path, "--check", "--cache", "--deep")
+    assert "1 verified, 0 cached-verified" in deep.stdout
+
+
+def test_cache_respects_trust_window(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha"})
+    entry = checksum.ChecksumEntry("sha256", checksum.ChecksumManager.compute_checksum(
+        tmp_path / "a", "sha256"), str(tmp_path / "a"))
+    st = os.stat(entry.file_path)
+
+    cache = checksum.VerificationCache(tmp_path / "cache")
+    cache.record(entry, st, True)
+    assert cache.lookup(entry, st)
+
+    cache.not_before = float("inf")
+    assert not cache.lookup(entry, st)
+    cache.close()
+
+
+def test_cache_ignores_entry_with_changed_digest(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha"})
+    st = os.stat(tmp_path / "a")
+    cache = checksum.VerificationCache(tmp_path / "cache")
+    cache.record(checksum.ChecksumEntry("md5", "00", str(tmp_path / "a")), st, True)
+
+    assert not cache.lookup(checksum.ChecksumEntry("md5", "11", str(tmp_path / "a")), st)
+    cache.close()
+
+
+def test_engine_limits_rotational_devices(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(checksum, "is_rotational", lambda device: device == 7)
+    engine = checksum.HashingEngine(jobs=8)
+
+    assert engine.device_limit(7) == 1
+    assert engine.device_limit(8) == 8
+    assert checksum.HashingEngine(jobs=8, device_jobs=3).device_limit(7) == 3
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_engine_hashes_every_job(tmp_path: Path, processes: bool) -> None:
+    make_tree(tmp_path, {f"f{i}": str(i).encode() for i in range(12)})
+    jobs = [
+        checksum.HashJob(str(path), "sha256", os.stat(path))
+        for path in sorted(tmp_path.iterdir())
+    ]
+    engine = checksum.HashingEngine(jobs=4, device_jobs=2, processes=processes)
+
+    results = {job.file_path: digest for job, digest, error in engine.run(jobs)}
+
+    assert results == {
+        job.file_path: checksum.ChecksumManager.compute_checksum(Path(job.file_path), "sha256")
+        for job in jobs
+    }
+
+
+def test_engine_forks_workers_before_running(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"f": b"data"})
+    engine = checksum.HashingEngine(jobs=3, processes=True)
+
+    engine.start_processes()
+    assert len(multiprocessing.active_children()) == 3
+
+    [(job, digest, error)] = engine.run([checksum.HashJob(str(tmp_path / "f"), "sha256",
+                                                          os.stat(tmp_path / "f"))])
+    assert error is None and digest == hashlib.sha256(b"data").hexdigest()
+
+
+def test_parallel_check_reports_missing_and_mismatched_files(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta", "c": b"gamma"})
+    run_cli(tmp_path, "--algo", "md5", "a", "b", "c")
+    (tmp_path / "b").unlink()
+    (tmp_path / "c").write_bytes(b"changed")
+
+    result = run_cli(tmp_path, "--check", "--jobs", "3", "--processes")
+
+    assert result.returncode == 1
+    assert "✗ b: File not found" in result.stdout
+    assert "✗ c: Checksum MISMATCH!" in result.stdout
+    assert "1 verified, 0 added, 1 mismatches, 1 errors" in result.stdout
+
+
+@pytest.mark.parametrize("algorithm", ["sha256", "md5"])
+@pytest.mark.parametrize("buffer_size", [1, 7, 4096, 1 << 20])
+def test_buffer_size_does_not_change_digest(tmp_path: Path, algorithm: str, buffer_size: int) -> None:
+    data = os.urandom(10000)
+    make_tree(tmp_path, {"f": data})
+
+    digest = checksum.ChecksumManager.compute_checksum(tmp_path / "f", algorithm, buffer_size)
+
+    import hashlib
+    assert digest == hashlib.new(algorithm, data).hexdigest()
+
+
+@pytest.mark.skipif(not checksum.HAS_BLAKE3_MMAP, reason="blake3 update_mmap unavailable")
+def test_blake3_mmap_path_matches_streaming(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    make_tree(tmp_path, {"f": os.urandom(300000)})
+    streamed = checksum.ChecksumManager.compute_checksum(tmp_path / "f", "blake3")
+
+    monkeypatch.setattr(checksum, "MMAP_THRESHOLD", 0)
+
+    assert checksum.ChecksumManager.compute_checksum(tmp_path / "f", "blake3") == streamed
+
+
+def test_parse_size() -> None:
+    assert checksum.parse_size("65536") == 65536
+    assert checksum.parse_size("256k") == 256 << 10
+    assert checksum.parse_size("4M") == 4 << 20
+    assert checksum.parse_size("1GiB") == 1 << 30
+
+
+def test_new_entries_are_appended_without_rewriting(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta"})
+    run_cli(tmp_path, "--algo", "md5", "a")
+    sums = tmp_path / "SUMS.txt"
+    inode = sums.stat().st_ino
+
+    result = run_cli(tmp_path, "--algo", "md5", "--flush-every", "1", "a", "b")
+
+    assert result.returncode == 0
+    assert sums.stat().st_ino == inode
+    assert [line.split()[2] for line in sums.read_text().splitlines()] == ["a", "b"]
+    assert not (tmp_path / "SUMS.txt.journal").exists()
+
+
+def test_interrupted_run_resumes_from_journal(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta", "c": b"gamma"})
+    run_cli(tmp_path, "--algo", "md5", "a")
+    sums = tmp_path / "SUMS.txt"
+    base = sums.stat().st_size
+    journal_b = f"MD5 {checksum.hashlib.md5(b'beta').hexdigest()} b\n"
+    # Crash during the merge: journal intact, SUMS.txt has a torn tail,
+    # and the journal itself ends with a torn line
+    (tmp_path / "SUMS.txt.journal").write_text(
+        f"{checksum.SumsJournal.HEADER}{base}\n{journal_b}MD5 0123 c")
+    with open(sums, "a") as f:
+        f.write(journal_b[:10])
+
+    result = run_cli(tmp_path, "--algo", "md5", "b", "c")
+
+    assert "b added (MD5, resumed)" in result.stdout
+    assert "c added (MD5)" in result.stdout
+    lines = sums.read_text().splitlines()
+    assert [line.split()[2] for line in lines] == ["a", "b", "c"]
+    assert lines[1] + "\n" == journal_b
+    assert not (tmp_path / "SUMS.txt.journal").exists()
+
+
+def test_compact_keeps_latest_entry_per_file(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha"})
+    (tmp_path / "SUMS.txt").write_text("MD5 00 a\nMD5 11 b\nMD5 22 a\n")
+
+    result = run_cli(tmp_path, "--compact")
+
+    assert result.returncode == 0
+    assert "1 superseded line(s) removed" in result.stdout
+    assert (tmp_path / "SUMS.txt").read_text() == "MD5 22 a\nMD5 11 b\n"
+
+
+def write_sums(path: Path, lines: list[str]) -> None:
+    path.write_text("".join(line + "\n" for line in lines))
+
+
+def test_sums_index_later_lines_win_in_place(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    write_sums(sums, ["# comment", "MD5 00ff a", "SHA1 abcd b", "bad line", "MD5 11EE a"])
+
+    index = checksum.SumsIndex.load(sums)
+
+    assert len(index) == 2
+    assert list(index) == ["a", "b"]
+    assert index["a"] == checksum.ChecksumEntry("md5", "11ee", "a")
+    assert [entry.file_path for entry in index.entries()] == ["a", "b"]
+
+
+def test_sums_index_keeps_non_hex_digests_and_paths_with_spaces(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    write_sums(sums, ["MD5 NotHex some dir/file name.txt"])
+
+    index = checksum.SumsIndex.load(sums)
+
+    assert index["some dir/file name.txt"].checksum == "nothex"
+
+
+def test_sums_index_mutation(tmp_path: Path) -> None:
+    index = checksum.SumsIndex()
+    index["a"] = checksum.ChecksumEntry("md5", "00", "a")
+    index["b"] = checksum.ChecksumEntry("md5", "11", "b")
+    index["a"] = checksum.ChecksumEntry("sha256", "2222", "a")
+    del index["b"]
+
+    assert dict(index.items()) == {"a": checksum.ChecksumEntry("sha256", "2222", "a")}
+
+
+def test_sums_index_cache_reused_and_extended_by_appends(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    cache = tmp_path / "SUMS.txt.idx"
+    write_sums(sums, ["MD5 00 a", "MD5 11 b"])
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+    assert cache.exists()
+
+    with open(sums, "a") as f:
+        f.write("MD5 22 a\nMD5 33 c\n")
+    index = checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    assert index.lines == 4
+    assert {path: entry.checksum for path, entry in index.items()} == {"a": "22", "b": "11", "c": "33"}
+    reloaded = checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+    assert list(reloaded.entries()) == list(index.entries())
+
+
+def test_sums_index_cache_invalidated_by_rewrite(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    cache = tmp_path / "SUMS.txt.idx"
+    write_sums(sums, ["MD5 00 a", "MD5 11 b"])
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    write_sums(sums, ["MD5 99 z", "MD5 11 b", "MD5 22 c"])
+    index = checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    assert list(index) == ["z", "b", "c"]
+
+
+def test_sums_index_cache_rejected_after_edit_then_append(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    cache = tmp_path / "SUMS.txt.idx"
+    write_sums(sums, ["MD5 00 a"] + [f"MD5 11 f{i}" for i in range(40)])
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    # Fix the first line by hand (same length, so the tail bytes are unchanged)
+    sums.write_bytes(sums.read_bytes().replace(b"MD5 00 a", b"MD5 99 a", 1))
+    with open(sums, "a") as f:
+        f.write("MD5 22 c\n")
+    index = checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    assert index["a"].checksum == "99"
+    assert index["c"].checksum == "22"
+
+
+def test_sums_index_cache_hashes_the_prefix_once(tmp_path: Path,
+                                                  monkeypatch: pytest.MonkeyPatch) -> None:
+    sums = tmp_path / "SUMS.txt"
+    cache = tmp_path / "SUMS.txt.idx"
+    write_sums(sums, ["MD5 00 a", "MD5 11 b"])
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+    size = sums.stat().st_size
+    with open(sums, "a") as f:
+        f.write("MD5 22 c\n")
+
+    ranges = []
+    real_hash_range = checksum.SumsIndex._hash_range
+    monkeypatch.setattr(checksum.SumsIndex, "_hash_range", staticmethod(
+        lambda f, start, end, hasher: ranges.append((start, end)) or
+        real_hash_range(f, start, end, hasher)))
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    assert ranges == [(0, size), (size, sums.stat().st_size)]
+    monkeypatch.undo()
+    assert checksum.SumsIndex.load(sums, cache, min_cache_entries=0)["c"].checksum == "22"
+
+
+def test_bad_index_cache_is_rebuilt(tmp_path: Path) -> None:
+    sums = tmp_path / "SUMS.txt"
+    cache = tmp_path / "SUMS.txt.idx"
+    write_sums(sums, ["MD5 00 a", "MD5 11 b"])
+    checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    # A cache claiming every algorithm id is taken cannot take the appended line
+    magic, header, data = cache.read_bytes().split(b"\n", 2)
+    fields = json.loads(header)
+    fields["algorithms"] = ["md5"] + [f"x{i}" for i in range(127)]
+    cache.write_bytes(magic + b"\n" + json.dumps(fields).encode() + b"\n" + data)
+    with open(sums, "a") as f:
+        f.write("SHA1 22 c\n")
+    index = checksum.SumsIndex.load(sums, cache, min_cache_entries=0)
+
+    assert {path: entry.checksum for path, entry in index.items()} == {"a": "00", "b": "11", "c": "22"}
+
+
+def test_unindexable_sums_file_is_reported(tmp_path: Path) -> None:
+    write_sums(tmp_path / "SUMS.txt", [f"ALG{i} 00 f{i}" for i in range(200)])
+
+    result = run_cli(tmp_path, "--check")
+
+    assert result.returncode == 2
+    assert "Error reading SUMS.txt: too many checksum types" in result.stderr
+    assert "Traceback" not in result.stderr
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_walk_files_streams_sorted_depth_first(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, jobs: int) -> None:
+    make_tree(tmp_path, {"b": b"", "a/z": b"", "a/y/x": b"", "c/w": b"", "a.txt": b""})
+    monkeypatch.chdir(tmp_path)
+
+    found = list(checksum.walk_files(["."], recursive=True, jobs=jobs))
+
+    assert [f.path for f in found] == ["a.txt", "b", "a/z", "a/y/x", "c/w"]
+    assert all(f.stat is not None and f.stat.st_size == 0 for f in found)
+
+
+def test_walk_files_paths_relative_to_cwd(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    make_tree(tmp_path, {"d/a": b"", "d/sub/b": b""})
+    monkeypatch.chdir(tmp_path)
+
+    assert checksum.expand_paths([str(tmp_path / "d")]) == ["d/a"]
+    assert checksum.expand_paths(["d/", "missing"], recursive=True) == ["d/a", "d/sub/b", "missing"]
+
+
+def test_check_missing_uses_single_walk(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "sub/b": b"beta"})
+    run_cli(tmp_path, "--algo", "md5", "--recursive", ".")
+    make_tree(tmp_path, {"sub/new": b"new"})
+    (tmp_path / "a").unlink()
+
+    result = run_cli(tmp_path, "--check", "--missing", "--recursive", "--jobs", "2")
+
+    assert "✗ a: File not found" in result.stdout
+    assert "✓ sub/b" in result.stdout
+    assert "1 file(s) not in SUMS.txt:\n  sub/new\n" in result.stdout
+
+
+def test_compute_checksums_single_pass_matches_individual(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"f": os.urandom(50000)})
+    algorithms = ["md5", "sha1", "sha512"] + (["blake3"] if checksum.HAS_BLAKE3 else [])
+
+    digests = checksum.ChecksumManager.compute_checksums(tmp_path / "f", algorithms, 4096)
+
+    assert digests == [
+        checksum.ChecksumManager.compute_checksum(tmp_path / "f", algorithm)
+        for algorithm in algorithms
+    ]
+
+
+@pytest.mark.parametrize("jobs", ["1", "3"])
+def test_migrate_to_rewrites_verified_entries(tmp_path: Path, jobs: str) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta", "c": b"gamma"})
+    run_cli(tmp_path, "--algo", "md5", "a", "b")
+    run_cli(tmp_path, "--algo", "sha256", "c")
+    (tmp_path / "b").write_bytes(b"corrupt")
+
+    result = run_cli(tmp_path, "--check", "--migrate-to", "sha512", "--jobs", jobs)
+
+    assert result.returncode == 1
+    assert "✓ a migrated (MD5 → SHA512)" in result.stdout
+    assert "✓ c migrated (SHA256 → SHA512)" in result.stdout
+    assert "✗ b: Checksum MISMATCH!" in result.stdout
+    assert "0 verified, 2 migrated" in result.stdout
+    lines = sorted((tmp_path / "SUMS.txt").read_text().splitlines(), key=lambda l: l.split()[2])
+    assert [line.split()[0] for line in lines] == ["SHA512", "MD5", "SHA512"]
+    import hashlib
+    assert lines[0].split()[1] == hashlib.sha512(b"alpha").hexdigest()
+
+    again = run_cli(tmp_path, "--check", "--migrate-to", "sha512")
+    assert "2 verified, 0 migrated" in again.stdout
+
+
+def test_compute_quick_samples_start_middle_and_end(tmp_path: Path) -> None:
+    data = bytearray(os.urandom(100))
+    make_tree(tmp_path, {"f": bytes(data)})
+    base = checksum.compute_quick(tmp_path / "f", 10)
+    assert base.startswith("100:10:")
+
+    for offset, detected in [(0, True), (47, True), (95, True), (20, False), (75, False)]:
+        changed = bytearray(data)
+        changed[offset] ^= 0xFF
+        (tmp_path / "f").write_bytes(bytes(changed))
+        assert (checksum.compute_quick(tmp_path / "f", 10) != base) == detected, offset
+
+
+class FullHashLog:
+    """Stands in for the verification cache's record of full hashes."""
+
+    def __init__(self) -> None:
+        self.times: Dict[str, float] = {}
+
+    def last_verified(self, entry, st) -> Optional[float]:
+        return self.times.get(entry.file_path)
+
+
+@pytest.mark.parametrize("period_days, run_every", [(7, 1), (7, 7), (30, 7), (30, 3)])
+def test_full_due_covers_every_file_each_period(period_days: int, run_every: int) -> None:
+    manager = checksum.ChecksumManager.__new__(checksum.ChecksumManager)
+    manager.full_period = period_days * 86400
+    manager.cache = log = FullHashLog()
+    entries = [checksum.ChecksumEntry("md5", "00", f"file{i}") for i in range(300)]
+    period, gap = period_days * 86400, run_every * 86400
+
+    start = 20000 * 86400.0
+    hashed_per_run = []
+    for day in range(0, 120, run_every):
+        now = start + day * 86400.0
+        due = [entry for entry in entries if manager.full_due(entry, None, now)]
+        for entry in due:
+            last = log.times.get(entry.file_path)
+            # Once per period, give or take the time between runs
+            assert last is None or now - last <= period + gap
+            assert last in (None, start) or now - last > period - gap
+            log.times[entry.file_path] = now
+        assert all(now - last <= period + gap for last in log.times.values())
+        hashed_per_run.append(len(due))
+
+    assert hashed_per_run[0] == len(entries)
+    # Later runs share the work rather than rehashing everything at once
+    share = len(entries) * min(1.0, run_every / period_days)
+    assert max(hashed_per_run[1:]) <= 2 * share
+
+
+def test_quick_check_fingerprints_then_samples(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    make_tree(tmp_path, {"a": b"a" * 100, "b": b"b" * 100, "c": b"c" * 100})
+    run_cli(tmp_path, "--algo", "sha256", "a", "b", "c")
+
+    # Entries without a fingerprint are fully verified and fingerprinted
+    first = run_cli(tmp_path, "--check", "--quick", "--quick-sample", "8")
+    assert "3 verified, 0 quick-verified" in first.stdout
+    lines = (tmp_path / "SUMS.txt").read_text().splitlines()
+    assert [line.split()[0] for line in lines] == ["SHA256+Q"] * 3
+    assert lines[0].split()[2].startswith("100:8:")
+
+    # Not due for a full hash: only the samples are read
+    monkeypatch.chdir(tmp_path)
+    manager = checksum.ChecksumManager(quick=True)
+    monkeypatch.setattr(manager, "full_due", lambda entry, st: False)
+    (tmp_path / "b").write_bytes(b"b" * 50 + b"X" + b"b" * 49)
+    (tmp_path / "c").write_bytes(b"c" * 101)
+    assert manager.check_file("a").action == "quick"
+    assert manager.check_file("b").message == "✗ b: Sampled checksum MISMATCH!"
+    assert manager.check_file("c").message == "✗ c: Size changed (100 → 101 bytes)"
+
+    # Due files still get a full hash
+    monkeypatch.setattr(manager, "full_due", lambda entry, st: True)
+    assert manager.check_file("a").action == "verified"
+
+
+def test_quick_fields_recorded_on_add(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"f": b"data"})
+    run_cli(tmp_path, "--algo", "md5", "--quick-fields", "f")
+
+    entry = checksum.parse_sums_line((tmp_path / "SUMS.txt").read_text())
+    assert entry.checksum_type == "md5"
+    assert entry.quick == checksum.compute_quick(tmp_path / "f")
+    assert "✓ f" in run_cli(tmp_path, "--check").stdout
+
+
+def test_run_stats_histogram_slowest_and_eta(tmp_path: Path) -> None:
+    st = os.stat(tmp_path)
+    stats = checksum.RunStats(total_files=4, slowest=2)
+    for name, seconds in [("a", 0.0004), ("b", 0.003), ("c", 0.0031), ("d", 1.5)]:
+        job = checksum.HashJob(name, "md5", st, elapsed=seconds, cpu_time=seconds / 2)
+        stats.record_job(job)
+        stats.record_result(checksum.ProcessResult(name, True, "added", ""))
+
+    record = stats.snapshot(final=True)
+
+    assert record["hashed"] == 4
+    assert record["cpu_ratio"] == 0.5
+    assert record["latency_ms"] == [
+        {"le": 1, "count": 1}, {"le": 4, "count": 2}, {"le": 2048, "count": 1}]
+    assert [slow["path"] for slow in record["slowest"]] == ["d", "c"]
+    assert record["actions"] == {"added": 4}
+    assert stats.snapshot()["eta"] == 0.0
+
+
+def test_progress_json_reports_final_record(tmp_path: Path) -> None:
+    make_tree(tmp_path, {"a": b"alpha", "b": b"beta"})
+    run_cli(tmp_path, "--algo", "sha256", "a", "b")
+
+    result = run_cli(tmp_path, "--check", "--jobs", "2", "--progress", "json")
+
+    assert result.returncode == 0
+    import json
+    final = json.loads(result.stderr.strip().splitlines()[-1])
+    assert final["type"] == "final"
+    assert final["files"] == final["total_files"] == 2
+    assert final["bytes"] == 9
+    assert sum(bucket["count"] for bucket in final["latency_ms"]) == 2
+    assert "queued" in final and "running" in final
@@ -0,0 +1,290 @@
+import importlib.util
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+
+
+SCRIPT = Path(__file__).with_name("find_duplicates.py")
+
+
+def load_find_duplicates():
+    spec = importlib.util.spec_from_file_location("find_duplicates_under_test", SCRIPT)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+find_duplicates = load_find_duplicates()
+
+
+def linear_priority_index(path: str, priorities: List[str]) -> Optional[int]:
+    """The original O(priorities) scan, kept as the reference semantics."""
+    best_match_index = None
+    best_match_length = 0
+    for index, priority_dir in enumerate(priorities):
+        priority_normalized = priority_dir.rstrip('/')
+        path_normalized = path.rstrip('/')
+        if path_normalized.startswith(priority_normalized + '/') or \
+           path_normalized == priority_normalized:
+            if len(priority_normalized) > best_match_length:
+                best_match_index = index
+                best_match_length = len(priority_normalized)
+    return best_match_index
+
+
+def test_priority_index_prefers_most_specific_directory() -> None:
+    index = find_duplicates.PriorityIndex(["/tank", "/tank/Photos/", "/tank/Pictures"])
+
+    assert index.lookup("/tank/Photos/a.jpg") == 1
+    assert index.lookup("/tank/Photos2/a.jpg") == 0
+    assert index.lookup("/tank/Pictures") == 2
+    assert index.lookup("/other/a.jpg") is None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_priority_index_matches_linear_scan(seed: int) -> None:
+    rng = random.Random(seed)
+    parts = ["a", "b", "ab", ""]
+
+    def random_path() -> str:
+        path = "/".join(rng.choice(parts) for _ in range(rng.randint(1, 5)))
+        return path + "/" * rng.randint(0, 2)
+
+    priorities = [random_path() for _ in range(30)] + ["/", "a", "a"]
+    index = find_duplicates.PriorityIndex(priorities)
+
+    for _ in range(500):
+        path = random_path()
+        assert index.lookup(path) == linear_priority_index(path, priorities), path
+
+
+def test_find_duplicates_accepts_priority_list_or_index() -> None:
+    hash_to_paths = {"h1": ["/b/x", "/a/x", "/c/x"], "h2": ["/c/y"], "h3": ["/c/z", "/c/w"]}
+    priorities = ["/a", "/b"]
+
+    for prio in (priorities, find_duplicates.PriorityIndex(priorities)):
+        assert find_duplicates.find_duplicates_to_keep(hash_to_paths, prio) == ["/a/x", "/c/z"]
+        assert find_duplicates.find_duplicates_to_remove(hash_to_paths, prio) == [
+            "/b/x", "/c/w", "/c/x"]
+
+
+def write_hashes(path: Path, pairs: List[Tuple[str, str]]) -> Path:
+    path.write_text("".join(f"{h}  {p}\n" for h, p in pairs))
+    return path
+
+
+@pytest.mark.parametrize("run_lines", [1, 3, 1000])
+def test_external_sort_groups_match_in_memory(tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+                                              run_lines: int) -> None:
+    monkeypatch.setattr(find_duplicates, "MERGE_FAN_IN", 2)
+    rng = random.Random(run_lines)
+    files = [
+        write_hashes(tmp_path / f"h{n}.txt",
+                     [(f"{rng.randrange(20):04x}", f"/d{n}/f {i}") for i in range(40)])
+        for n in range(3)
+    ]
+
+    groups = list(find_duplicates.iter_hash_groups(
+        find_duplicates.iter_sorted_pairs(files, run_lines=run_lines, temp_dir=str(tmp_path))))
+
+    expected = find_duplicates.collect_all_hashes(files)
+    assert groups == sorted(expected.items())
+    assert sorted(find_duplicates.iter_duplicates_to_remove(groups, ["/d2"])) == \
+        find_duplicates.find_duplicates_to_remove(expected, ["/d2"])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["h0.txt", "h1.txt", "h2.txt"]
+
+
+def test_presorted_merge_rejects_unsorted_input(tmp_path: Path) -> None:
+    good = write_hashes(tmp_path / "a", [("aa", "/x/1"), ("bb", "/x/2")])
+    other = write_hashes(tmp_path / "b", [("aa", "/y/1"), ("cc", "/y/2")])
+    bad = write_hashes(tmp_path / "c", [("bb", "/z/1"), ("aa", "/z/2")])
+
+    groups = list(find_duplicates.iter_hash_groups(
+        find_duplicates.iter_sorted_pairs([good, other], presorted=True)))
+    assert groups == [("aa", ["/x/1", "/y/1"]), ("bb", ["/x/2"]), ("cc", ["/y/2"])]
+
+    with pytest.raises(ValueError, match="not sorted"):
+        list(find_duplicates.iter_sorted_pairs([bad], presorted=True))
+
+
+@pytest.mark.parametrize("mode", ["--external-sort", "--presorted"])
+def test_streaming_modes_reject_jobs(tmp_path: Path, mode: str) -> None:
+    (tmp_path / "prio").write_text("/a\n")
+    hashes = write_hashes(tmp_path / "h", [("11", "/a/x"), ("11", "/b/x")])
+
+    result = run_script(tmp_path, mode, "--jobs", "2", "prio", hashes)
+
+    assert result.returncode == 2
+    assert "--jobs cannot be combined" in result.stderr
+
+
+def test_compact_groups_keep_only_repeated_hashes(tmp_path: Path) -> None:
+    pairs = [("ab" * 16, "/tank/a/x"), ("AB" * 16, "/tank/b/x"), ("ab" * 16, "rel"),
+             ("cd" * 16, "/tank/a/y"), ("not-hex", "/z"), ("not-hex", "/tank/a/"),
+             ("ef" * 16, "/tank/a/z"), ("ab" * 16, "/tank/b/x")]
+    files = [write_hashes(tmp_path / "h1", pairs[:4]), write_hashes(tmp_path / "h2", pairs[4:])]
+
+    compact = find_duplicates.collect_duplicate_groups(files)
+    groups = dict(find_duplicates.iter_compact_groups(compact))
+
+    assert groups == {
+        "ab" * 16: ["/tank/a/x", "rel", "/tank/b/x"],
+        "not-hex": ["/z", "/tank/a/"],
+    }
+    assert isinstance(next(iter(compact)), bytes)
+    expected = find_duplicates.collect_all_hashes(files)
+    assert {h: p for h, p in expected.items() if len(p) > 1} == groups
+
+
+def test_parallel_parse_matches_serial(tmp_path: Path) -> None:
+    rng = random.Random(7)
+    files = [
+        write_hashes(tmp_path / f"h{n}",
+                     [(f"{rng.randrange(50):064x}", f"/d{n % 2}/sub/f{i}") for i in range(300)])
+        for n in range(3)
+    ]
+    ranges = find_duplicates.split_ranges(files[0], 500)
+    assert len(ranges) > 5 and ranges[0][0] == 0
+    assert ranges[-1][1] == files[0].stat().st_size
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+    serial = dict(find_duplicates.iter_compact_groups(
+        find_duplicates.collect_duplicate_groups(files)))
+    parallel = dict(find_duplicates.iter_compact_groups(
+        find_duplicates.collect_duplicate_groups(files, jobs=3)))
+    assert parallel == serial
+
+
+def test_parallel_parse_reports_file_line_numbers(tmp_path: Path) -> None:
+    hash_file = tmp_path / "h"
+    hash_file.write_text("aa /x\n" * 20 + "garbage\n")
+
+    with pytest.raises(ValueError, match="at line 21"):
+        list(find_duplicates._parallel_candidates([hash_file], 2, 16))
+
+
+def run_script(cwd: Path, *args: object) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, str(SCRIPT), *map(str, args)], cwd=cwd,
+                          text=True, capture_output=True, check=False)
+
+
+def test_db_ingests_only_changed_files_and_reports_group_changes(tmp_path: Path) -> None:
+    (tmp_path / "prio").write_text("/a\n")
+    host1 = write_hashes(tmp_path / "host1", [("11", "/b/x"), ("22", "/b/y"), ("33", "/c/z")])
+    host2 = write_hashes(tmp_path / "host2", [("11", "/c/x"), ("44", "/c/w")])
+    hash_files = [host1, host2]
+
+    first = run_script(tmp_path, "--db", "d.db", "--changes", "prio", *hash_files)
+    assert first.stdout == "new\t11\t/b/x\n"
+    assert "Ingested 2 of 2" in first.stderr
+
+    unchanged = run_script(tmp_path, "--db", "d.db", "--changes", "prio", *hash_files)
+    assert unchanged.stdout == ""
+    assert "Ingested 0 of 2" in unchanged.stderr
+
+    write_hashes(host2, [("11", "/a/x"), ("22", "/c/y"), ("11", "/c/x2")])
+    os.utime(host2, ns=(0, 0))
+    changed = run_script(tmp_path, "--db", "d.db", "--changes", "prio", *hash_files)
+    assert changed.stdout == "keeper\t11\t/a/x\nnew\t22\t/b/y\n"
+    assert "Ingested 1 of 2" in changed.stderr
+
+    kept = run_script(tmp_path, "--db", "d.db", "--show-kept", "prio", *hash_files)
+    removed = run_script(tmp_path, "--db", "d.db", "prio", *hash_files)
+    plain_kept = run_script(tmp_path, "--show-kept", "prio", *hash_files)
+    plain_removed = run_script(tmp_path, "prio", *hash_files)
+    assert kept.stdout == plain_kept.stdout == "/a/x\n/b/y\n"
+    assert removed.stdout == plain_removed.stdout
+
+    dropped = run_script(tmp_path, "--db", "d.db", "--changes", "prio", host1)
+    assert dropped.stdout == "resolved\t11\t\nresolved\t22\t\n"
+
+
+def test_db_accepts_the_same_hash_file_twice(tmp_path: Path) -> None:
+    (tmp_path / "prio").write_text("/a\n")
+    host = write_hashes(tmp_path / "host", [("11", "/b/x"), ("11", "/c/x"), ("22", "/c/y")])
+
+    first = run_script(tmp_path, "--db", "d.db", "--changes", "prio", host, host)
+    assert first.returncode == 0, first.stderr
+    assert first.stdout == "new\t11\t/b/x\n"
+
+    write_hashes(host, [("11", "/b/x"), ("22", "/c/y"), ("22", "/a/y")])
+    os.utime(host, ns=(0, 0))
+    changed = run_script(tmp_path, "--db", "d.db", "--changes", "prio", host, host)
+    assert changed.returncode == 0, changed.stderr
+    assert changed.stdout == "resolved\t11\t\nnew\t22\t/a/y\n"
+
+    with sqlite3.connect(tmp_path / "d.db") as db:
+        assert db.execute("SELECT count(*) FROM sources").fetchone() == (1,)
+        assert db.execute("SELECT count(*) FROM entries").fetchone() == (3,)
+
+
+@pytest.mark.parametrize("count", [10, 1000])
+def test_db_group_update_statements_do_not_grow_with_hashes(tmp_path: Path, count: int) -> None:
+    host = write_hashes(tmp_path / "host", [(f"{i:032x}", f"/{d}/f{i}")
+                                            for i in range(count) for d in "ab"])
+    database = find_duplicates.DedupDatabase(tmp_path / "d.db")
+    dirty, _ = database.sync([host])
+    statements: List[str] = []
+    database._db.set_trace_callback(statements.append)
+
+    changes = database.update_groups(dirty, [host], find_duplicates.PriorityIndex(["/b"]))
+
+    assert len(changes) == count
+    assert all(keeper.startswith("/b/") for _, _, keeper in changes)
+    # Sources, settings, stored groups and entries: one query each, whatever the count
+    assert sum(1 for sql in statements if sql.lstrip().upper().startswith("SELECT")) == 4
+    database.close()
+
+
+def test_scan_matches_hash_file_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    big = os.urandom(40000).replace(b"x", b"y")  # So the one-byte edits below differ
+    tree = {
+        "a/big": big, "b/big": big, "b/big-tail": big[:-1] + b"x", "b/big-head": b"x" + big[1:],
+        "a/small": b"same", "c/small": b"same", "c/other": b"diff", "a/empty": b"", "b/empty": b"",
+        "c/unique": b"only one of these size!",
+    }
+    for name, data in tree.items():
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_bytes(data)
+    os.link(tmp_path / "a/big", tmp_path / "c/big-link")
+    (tmp_path / "prio").write_text(f"{tmp_path}/b\n")
+
+    full_hashed = []
+    real_full_hash = find_duplicates.full_hash
+    monkeypatch.setattr(find_duplicates, "full_hash",
+                        lambda path: full_hashed.append(path) or real_full_hash(path))
+    dirs = [tmp_path / "a", tmp_path / "b", tmp_path / "c"]
+    groups = dict(find_duplicates.scan_duplicate_groups(dirs, jobs=2))
+
+    # Only the big file (one read for both hard links) needs a full hash
+    assert len(full_hashed) == 2
+    assert sorted(map(sorted, groups.values())) == sorted(sorted(str(tmp_path / p) for p in group) for group in [
+        ["a/big", "b/big", "c/big-link"], ["a/small", "c/small"], ["a/empty", "b/empty"]])
+
+    manifest = tmp_path / "hashes"
+    write_hashes(manifest, [(find_duplicates.full_hash(path), path)
+                            for path, _ in find_duplicates.walk_files(dirs)])
+    for flag in ([], ["--show-kept"]):
+        scanned = run_script(tmp_path, "--scan", *flag, "prio", *dirs)
+        hashed = run_script(tmp_path, *flag, "prio", manifest)
+        assert scanned.stdout == hashed.stdout != ""
+
+
+def test_walk_files_follows_symlinked_roots_only(tmp_path: Path) -> None:
+    (tmp_path / "real/sub").mkdir(parents=True)
+    (tmp_path / "real/sub/f").write_bytes(b"data")
+    (tmp_path / "root").symlink_to(tmp_path / "real")
+    (tmp_path / "real/loop").symlink_to(tmp_path / "real")
+    (tmp_path / "real/link").symlink_to(tmp_path / "real/sub/f")
+
+    found = [path for path, _ in find_duplicates.walk_files([tmp_path / "root"])]
+
+    assert found == [str(tmp_path / "root/sub/f")]
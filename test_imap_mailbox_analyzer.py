@@ -0,0 +1,572 @@
+import email
+import imaplib
+import importlib.util
+import io
+import multiprocessing
+import re
+import sys
+import time
+from email.message import EmailMessage, Message
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+
+SCRIPT = Path(__file__).with_name("imap-mailbox-analyzer.py")
+
+
+def load_analyzer():
+    spec = importlib.util.spec_from_file_location("imap_mailbox_analyzer_under_test", SCRIPT)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+analyzer = load_analyzer()
+
+
+class FakeMailbox:
+    def __init__(self):
+        self.next_uid = 1
+        self.messages: List[dict] = []
+
+    def add(self, raw: bytes, flags=("\\Seen",)) -> int:
+        uid = self.next_uid
+        self.next_uid += 1
+        self.messages.append({"uid": uid, "raw": raw, "flags": list(flags)})
+        return uid
+
+
+def imap_string(value: Optional[str]) -> str:
+    if value is None:
+        return "NIL"
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def bodystructure(part: Message) -> str:
+    """The RFC 3501 BODYSTRUCTURE of a parsed message (just the fields used)."""
+    rfc822 = part.get_content_type() == "message/rfc822"
+    if part.is_multipart() and not rfc822:
+        children = "".join(bodystructure(child) for child in part.get_payload())
+        return f"({children} {imap_string(part.get_content_subtype())})"
+    params = " ".join(f"{imap_string(k)} {imap_string(v)}" for k, v in part.get_params()[1:])
+    encoded = part.get_payload(0).as_bytes() if rfc822 else part.get_payload().encode()
+    fields = [imap_string(part.get_content_maintype()), imap_string(part.get_content_subtype()),
+              f"({params})" if params else "NIL", "NIL", "NIL",
+              imap_string(part.get("Content-Transfer-Encoding", "7bit")), str(len(encoded))]
+    if rfc822:
+        # Envelope (unused), the encapsulated body, then its line count
+        fields += ["NIL", bodystructure(part.get_payload(0))]
+    if rfc822 or part.get_content_maintype() == "text":
+        fields.append(str(encoded.count(b"\n")))
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_param("filename", header="Content-Disposition")
+        dsp_params = f"({imap_string('filename')} {imap_string(filename)})" if filename else "NIL"
+        fields += ["NIL", f"({imap_string(disposition)} {dsp_params})"]
+    return "(" + " ".join(fields) + ")"
+
+
+class FakeImapServer:
+    """Just enough of an IMAP4rev1 server for the analyzer, in memory."""
+
+    def __init__(self):
+        self.mailboxes: Dict[str, FakeMailbox] = {}
+        self.selected: Optional[FakeMailbox] = None
+        self.commands: List[str] = []
+        self.bytes_sent = 0
+        self.bad_uids: set = set()
+
+    def mailbox(self, name: str) -> FakeMailbox:
+        return self.mailboxes.setdefault(name, FakeMailbox())
+
+    def select_set(self, spec: str, by_uid: bool) -> List[dict]:
+        box = self.selected
+        key = (lambda m: m["uid"]) if by_uid else (lambda m: box.messages.index(m) + 1)
+        top = key(box.messages[-1]) if box.messages else 0
+        wanted = set()
+        for part in spec.split(","):
+            lo, _, hi = part.partition(":")
+            lo_n = top if lo == "*" else int(lo)
+            hi_n = lo_n if not hi else (top if hi == "*" else int(hi))
+            wanted.update(range(min(lo_n, hi_n), max(lo_n, hi_n) + 1))
+        return [m for m in box.messages if key(m) in wanted]
+
+    def fetch_items(self, m: dict, items: str) -> bytes:
+        raw = m["raw"]
+        header = raw.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"
+        parts = [f"UID {m['uid']}".encode()]
+        if "FLAGS" in items:
+            parts.append(f"FLAGS ({' '.join(m['flags'])})".encode())
+        if "INTERNALDATE" in items:
+            parts.append(b'INTERNALDATE "01-Jan-2024 00:00:00 +0000"')
+        if "RFC822.SIZE" in items:
+            parts.append(f"RFC822.SIZE {len(raw)}".encode())
+        if "BODYSTRUCTURE" in items:
+            parts.append(f"BODYSTRUCTURE {bodystructure(email.message_from_bytes(raw))}".encode())
+        out = b" ".join(parts)
+        for section, literal in (("BODY.PEEK[HEADER]", header), ("BODY.PEEK[]", raw)):
+            if section in items:
+                name = section.replace(".PEEK", "")
+                out += f" {name} {{{len(literal)}}}\r\n".encode() + literal
+                self.bytes_sent += len(literal)
+        return out
+
+    def handle(self, line: str) -> bytes:
+        self.commands.append(line)
+        tag, command, rest = (line.split(" ", 2) + ["", ""])[:3]
+        command = command.upper()
+        out = b""
+        if command == "CAPABILITY":
+            out += b"* CAPABILITY IMAP4rev1\r\n"
+        elif command in ("SELECT", "EXAMINE"):
+            self.selected = self.mailboxes[rest.strip('"')]
+            out += f"* {len(self.selected.messages)} EXISTS\r\n".encode()
+            out += f"* OK [UIDNEXT {self.selected.next_uid}] ok\r\n".encode()
+        elif command == "STATUS":
+            name, _, _ = rest.rpartition(" (")
+            box = self.mailboxes[name.strip('"')]
+            out += (f'* STATUS "{name.strip(chr(34))}" (MESSAGES {len(box.messages)} '
+                    f'UIDNEXT {box.next_uid})\r\n').encode()
+        elif command == "LIST":
+            for name in self.mailboxes:
+                out += f'* LIST (\\HasNoChildren) "/" "{name}"\r\n'.encode()
+        elif command in ("SEARCH", "FETCH", "UID"):
+            by_uid = command == "UID"
+            if by_uid:
+                command, _, rest = rest.partition(" ")
+                command = command.upper()
+            if command == "SEARCH":
+                key = (lambda m: m["uid"]) if by_uid else \
+                    (lambda m: self.selected.messages.index(m) + 1)
+                ids = " ".join(str(key(m)) for m in self.selected.messages)
+                out += f"* SEARCH {ids}".rstrip().encode() + b"\r\n"
+            elif command == "FETCH":
+                spec, items = rest.split(" ", 1)
+                if any(m["uid"] in self.bad_uids for m in self.select_set(spec, by_uid)):
+                    return f"{tag} NO cannot fetch\r\n".encode()
+                for m in self.select_set(spec, by_uid):
+                    seq = self.selected.messages.index(m) + 1
+                    out += f"* {seq} FETCH (".encode() + self.fetch_items(m, items) + b")\r\n"
+        elif command == "LOGOUT":
+            out += b"* BYE bye\r\n"
+        return out + f"{tag} OK done\r\n".encode()
+
+
+class FakeIMAP4(imaplib.IMAP4):
+    """imaplib client wired to a FakeImapServer instead of a socket."""
+
+    server: FakeImapServer
+
+    def __init__(self, command=None):
+        imaplib.IMAP4.__init__(self)
+
+    def open(self, host=None, port=None, timeout=None):
+        self.host, self.port, self.sock = None, None, None
+        self._out = bytearray(b"* PREAUTH fake ready\r\n")
+        self._in = b""
+
+    def read(self, size):
+        data, self._out[:size] = bytes(self._out[:size]), b""
+        return data
+
+    def readline(self):
+        end = self._out.find(b"\n") + 1
+        data, self._out[:end] = bytes(self._out[:end]), b""
+        return data
+
+    def send(self, data):
+        self._in += data
+        while b"\r\n" in self._in:
+            line, self._in = self._in.split(b"\r\n", 1)
+            self._out += self.server.handle(line.decode())
+
+    def shutdown(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, rows, db=None):
+        self.rows = rows
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.db.statements.append(sql)
+        self.result = self.rows(sql, params)
+
+    def copy_expert(self, sql, file):
+        self.db.statements.append(sql)
+        self.db.copied.append(file.read())
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeDb:
+    """Stands in for a psycopg2 connection holding known (mailbox, uid) rows."""
+
+    def __init__(self, known: Dict[str, List[str]]):
+        self.known = known
+        self.statements: List[str] = []
+        self.copied: List[str] = []
+        self.commits = 0
+
+    def cursor(self):
+        def rows(sql, params):
+            if "information_schema" in sql:
+                return [(True,)]
+            if params:
+                return [(uid,) for uid in self.known.get(params[0], [])]
+            return []
+        return FakeCursor(rows, self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def fake_server() -> FakeImapServer:
+    server = FakeImapServer()
+    FakeIMAP4.server = server
+    return server
+
+
+def make_message(n: int, attachment: bytes = b"") -> bytes:
+    msg = EmailMessage()
+    msg["Message-ID"] = f"<m{n}@example.com>"
+    msg["Subject"] = f"message {n}"
+    msg["From"] = "a@example.com"
+    msg.set_content(f"body of message {n}\n")
+    if attachment:
+        msg.add_attachment(attachment, maintype="application", subtype="octet-stream",
+                           filename=f"file{n}.bin")
+    return msg.as_bytes().replace(b"\n", b"\r\n")
+
+
+def scan(server: FakeImapServer, incremental: bool = False, db=None, **kwargs):
+    imap = FakeIMAP4()
+    out = io.StringIO()
+    kwargs.setdefault("output_file", None)
+    stdout, sys.stdout = sys.stdout, out
+    try:
+        stats = analyzer.scan_all_mailboxes(imap, sorted(server.mailboxes),
+                                            incremental=incremental, db_conn=db, **kwargs)
+    finally:
+        sys.stdout = stdout
+    return stats, out.getvalue()
+
+
+def inserted_uids(sql: str) -> List[str]:
+    return re.findall(r"^VALUES \('[^']*', '(\d+)'", sql, re.M)
+
+
+def test_scan_writes_a_row_per_message(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(5):
+        inbox.add(make_message(n, attachment=b"x" * 100 if n % 2 else b""))
+
+    stats, sql = scan(fake_server)
+
+    assert inserted_uids(sql) == ["1", "2", "3", "4", "5"]
+    assert stats["total_messages"] == 5 and stats["errors"] == 0
+    assert stats["total_attachments"] == 2
+    assert stats["total_attachment_bytes"] == 200
+
+
+def test_incremental_scan_skips_known_uids_without_probing(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(6):
+        inbox.add(make_message(n))
+
+    stats, sql = scan(fake_server, incremental=True, db=FakeDb({"INBOX": ["1", "2", "4"]}))
+
+    assert inserted_uids(sql) == ["3", "5", "6"]
+    assert stats["already_in_db"] == 3
+    probes = [c for c in fake_server.commands if re.search(r"FETCH \S+ \(UID\)$", c)]
+    assert probes == []
+    assert any(" UID SEARCH ALL" in c for c in fake_server.commands)
+
+
+def test_unchanged_mailbox_costs_one_status(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(4):
+        inbox.add(make_message(n))
+
+    stats, sql = scan(fake_server, incremental=True, db=FakeDb({"INBOX": ["1", "2", "3", "4"]}))
+
+    assert inserted_uids(sql) == []
+    assert stats["already_in_db"] == 4
+    assert [c.split()[1] for c in fake_server.commands] == ["CAPABILITY", "STATUS"]
+
+
+def test_parse_fetch_response_joins_trailers() -> None:
+    data = [
+        (b"1 (UID 7 RFC822.SIZE 3 BODY[] {3}", b"abc"),
+        b" FLAGS (\\Seen))",
+        (b"2 (UID 9 BODY[] {2}", b"de"),
+        b")",
+        b"3 (UID 10 FLAGS ())",
+    ]
+    entries = analyzer.parse_fetch_response(data)
+    assert [literal for _, literal in entries] == [b"abc", b"de", None]
+    assert analyzer.parse_fetch_metadata(entries[0][0]) == (["\\Seen"], None, 3)
+    assert analyzer.compress_uid_set(["5", "1", "2", "3", "9", "10"]) == "1:3,5,9:10"
+
+
+def test_messages_fetched_once_in_batches(fake_server: FakeImapServer,
+                                          monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(analyzer, "FETCH_FIRST_BATCH", 4)
+    monkeypatch.setattr(analyzer, "FETCH_BATCH_BYTES", 10 * 1024)
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(60):
+        inbox.add(make_message(n))
+
+    stats, sql = scan(fake_server)
+
+    assert inserted_uids(sql) == [str(uid) for uid in range(1, 61)]
+    fetches = [c for c in fake_server.commands if " FETCH " in c]
+    assert all(c.endswith("(UID FLAGS INTERNALDATE RFC822.SIZE BODY.PEEK[])") for c in fetches)
+    assert fetches[0].split()[3] == "1:4"
+    assert 2 < len(fetches) < 10
+    assert fake_server.bytes_sent == sum(len(m["raw"]) for m in inbox.messages)
+
+
+def test_failed_batch_retried_per_message(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(5):
+        inbox.add(make_message(n))
+    fake_server.bad_uids = {3}
+
+    stats, sql = scan(fake_server)
+
+    assert inserted_uids(sql) == ["1", "2", "4", "5"]
+    assert stats["errors"] == 1
+
+
+def test_bodystructure_mode_downloads_only_headers(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(6):
+        inbox.add(make_message(n, attachment=bytes(range(256)) * 40 if n % 3 == 0 else b""))
+
+    full_stats, full_sql = scan(fake_server)
+    full_bytes, fake_server.bytes_sent = fake_server.bytes_sent, 0
+    stats, sql = scan(fake_server, use_bodystructure=True)
+
+    assert inserted_uids(sql) == inserted_uids(full_sql)
+    assert stats["errors"] == 0
+    assert stats["total_attachments"] == full_stats["total_attachments"] == 2
+    # Sizes are encoded octets: base64 is about 4/3 of the decoded payload
+    assert 1.3 < stats["total_attachment_bytes"] / full_stats["total_attachment_bytes"] < 1.4
+    assert fake_server.bytes_sent < full_bytes / 10
+    fetches = [c for c in fake_server.commands if " FETCH " in c]
+    assert "BODYSTRUCTURE BODY.PEEK[HEADER]" in fetches[-1]
+
+
+def test_bodystructure_descends_into_forwarded_messages(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(3):
+        outer = EmailMessage()
+        outer["Subject"] = f"Fwd: message {n}"
+        outer.set_content("see below\n")
+        inner = email.message_from_bytes(make_message(n, attachment=b"q" * 300 if n else b""))
+        outer.add_attachment(inner)
+        inbox.add(outer.as_bytes().replace(b"\n", b"\r\n"))
+
+    full_stats, full_sql = scan(fake_server)
+    stats, sql = scan(fake_server, use_bodystructure=True)
+
+    # The forwarded message and the attachment inside it both count
+    assert stats["total_attachments"] == full_stats["total_attachments"] == 5
+    assert stats["errors"] == full_stats["errors"] == 0
+    assert stats["total_body_bytes"] == full_stats["total_body_bytes"]
+    assert inserted_uids(sql) == inserted_uids(full_sql)
+
+
+def test_bodystructure_parsing() -> None:
+    fetch_str = ('1 (UID 4 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "us-ascii") NIL NIL "7BIT" 12 1 '
+                 'NIL NIL NIL NIL)("TEXT" "HTML" ("CHARSET" "us-ascii") NIL NIL "QUOTED-PRINTABLE" 30 2 '
+                 'NIL NIL NIL NIL) "ALTERNATIVE" ("BOUNDARY" "b1") NIL NIL NIL)'
+                 '("APPLICATION" "PDF" ("NAME" "=?utf-8?q?r=C3=A9sum=C3=A9.pdf?=") NIL NIL "BASE64" 4000 '
+                 'NIL NIL NIL NIL)'
+                 '("IMAGE" "PNG" NIL "<c1>" NIL "BASE64" 800 NIL ("INLINE" ("FILENAME" "a \\"b\\".png")) '
+                 'NIL NIL) "MIXED" ("BOUNDARY" "b0") NIL NIL NIL))')
+    structure = analyzer.parse_bodystructure(fetch_str)
+    parts = list(analyzer.iter_structure_parts(structure))
+
+    assert [p["content_type"] for p in parts] == ["text/plain", "text/html", "application/pdf", "image/png"]
+    assert parts[2]["filename"] == "r\u00e9sum\u00e9.pdf"
+    assert parts[3]["filename"] == 'a "b".png'
+    assert analyzer.get_structure_info(structure) == (42, 2, 4800)
+
+
+def test_bodystructure_decodes_rfc2231_filenames() -> None:
+    raw = (b"MIME-Version: 1.0\r\nContent-Type: multipart/mixed; boundary=b0\r\n\r\n"
+           b"--b0\r\nContent-Type: text/plain\r\n\r\nhi\r\n"
+           b"--b0\r\nContent-Type: image/png\r\nContent-Transfer-Encoding: base64\r\n"
+           b"Content-Disposition: inline; filename*=utf-8''na%C3%AFve.png\r\n\r\nAAAA\r\n"
+           b"--b0\r\nContent-Type: application/pdf; name*0*=utf-8''r%C3%A9;"
+           b" name*1=sum.pdf\r\nContent-Transfer-Encoding: base64\r\n\r\nBBBB\r\n"
+           b"--b0--\r\n")
+    fetch_str = ('1 (UID 1 BODYSTRUCTURE (("TEXT" "PLAIN" NIL NIL NIL "7BIT" 2 1 NIL NIL NIL NIL)'
+                 '("IMAGE" "PNG" NIL NIL NIL "BASE64" 4 NIL ("INLINE" ("FILENAME*" '
+                 '"utf-8\'\'na%C3%AFve.png")) NIL NIL)'
+                 '("APPLICATION" "PDF" ("NAME*0*" "utf-8\'\'r%C3%A9" "NAME*1" "sum.pdf") NIL NIL '
+                 '"BASE64" 4 NIL NIL NIL NIL) "MIXED" ("BOUNDARY" "b0") NIL NIL NIL))')
+    structure = analyzer.parse_bodystructure(fetch_str)
+    parts = list(analyzer.iter_structure_parts(structure))
+
+    assert [p["filename"] for p in parts] == [None, "na\u00efve.png", "r\u00e9sum.pdf"]
+    count, _ = analyzer.get_attachment_info(email.message_from_bytes(raw))
+    assert analyzer.get_structure_info(structure)[1] == count == 2
+
+
+def test_parse_fetch_response_inlines_earlier_literals() -> None:
+    data = [
+        (b'1 (UID 3 BODYSTRUCTURE ("APPLICATION" "PDF" ("NAME" {5}', b'a"b.c'),
+        (b') NIL NIL "BASE64" 10 NIL NIL NIL NIL) BODY[HEADER] {4}', b"X: y"),
+        b")",
+    ]
+    [(meta, literal)] = analyzer.parse_fetch_response(data)
+    assert literal == b"X: y"
+    parts = list(analyzer.iter_structure_parts(analyzer.parse_bodystructure(meta)))
+    assert parts[0]["filename"] == 'a"b.c' and parts[0]["size"] == 10
+
+
+def test_copy_text_value_escapes() -> None:
+    assert analyzer.copy_text_value(None) == "\\N"
+    assert analyzer.copy_text_value(42) == "42"
+    assert analyzer.copy_text_value("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+    assert analyzer.copy_text_value(["\\Seen", 'x"y']) == r'{"\\\\Seen","x\\"y"}'
+    assert analyzer.copy_text_value({"Subject": ["caf\u00e9\n"]}) == '{"Subject": ["caf\u00e9\\\\n"]}'
+
+
+def copied_rows(db: FakeDb) -> List[List[str]]:
+    return [line.split("\t") for chunk in db.copied for line in chunk.splitlines()]
+
+
+def test_load_copies_rows_in_batches(fake_server: FakeImapServer,
+                                     monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(analyzer, "COPY_BATCH_ROWS", 3)
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(7):
+        inbox.add(make_message(n))
+    db = FakeDb({})
+
+    stats, sql = scan(fake_server, db=db, load=True)
+
+    assert "INSERT" not in sql and "BEGIN" not in sql
+    assert len(db.copied) == 3
+    assert [row[1] for row in copied_rows(db)] == [str(uid) for uid in range(1, 8)]
+    assert db.statements[0].startswith("DROP TABLE")
+    copy_at = db.statements.index(next(s for s in db.statements if s.startswith("COPY")))
+    assert all(not s.startswith("CREATE INDEX") for s in db.statements[:copy_at])
+    assert db.statements[-1].startswith("CREATE INDEX")
+    assert db.commits == 1
+
+
+def test_incremental_load_upserts_through_staging(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(4):
+        inbox.add(make_message(n))
+    db = FakeDb({"INBOX": ["1", "2"]})
+
+    stats, sql = scan(fake_server, incremental=True, db=db, load=True)
+
+    assert [row[1] for row in copied_rows(db)] == ["3", "4"]
+    assert any(s.startswith("COPY email_messages_staging") for s in db.statements)
+    assert any("ON CONFLICT (mailbox, uid) DO UPDATE" in s for s in db.statements)
+    assert not any(s.startswith("DROP TABLE") for s in db.statements)
+
+
+def test_worker_pool_output_matches_inline(fake_server: FakeImapServer,
+                                           monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(analyzer, "FETCH_FIRST_BATCH", 3)
+    monkeypatch.setattr(analyzer, "PIPELINE_QUEUE_SIZE", 2)
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(25):
+        inbox.add(make_message(n, attachment=b"z" * n if n % 4 == 0 else b""))
+    fake_server.bad_uids = {7}
+
+    inline_stats, inline_sql = scan(fake_server)
+    stats, sql = scan(fake_server, workers=3)
+
+    def strip_dates(text: str) -> str:
+        text = re.sub(r"-- Generated: .*", "", text)
+        return re.sub(r"'\d{4}-\d\d-\d\dT[\d:.]+'\);", "", text)
+
+    assert strip_dates(sql) == strip_dates(inline_sql)
+    assert stats == inline_stats
+    assert stats["errors"] == 1 and stats["total_messages"] == 24
+
+
+def test_workers_start_before_the_prefetch_thread(fake_server: FakeImapServer,
+                                                  monkeypatch: pytest.MonkeyPatch) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(5):
+        inbox.add(make_message(n))
+    children = []
+    real_prefetch = analyzer.prefetch
+
+    def prefetch(items, maxsize):
+        children.append(len(multiprocessing.active_children()))
+        return real_prefetch(items, maxsize)
+
+    monkeypatch.setattr(analyzer, "prefetch", prefetch)
+    stats, _ = scan(fake_server, workers=2)
+
+    assert stats["total_messages"] == 5
+    assert children == [2]
+
+
+def test_progress_counts_duplicates(fake_server: FakeImapServer,
+                                    capsys: pytest.CaptureFixture) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    for n in range(100):
+        inbox.add(make_message(n))
+
+    analyzer.scan_all_mailboxes(FakeIMAP4(), ["INBOX", "INBOX"], output_file=None)
+
+    out, err = capsys.readouterr()
+    assert len(inserted_uids(out)) == 100
+    assert err.count("Processed 100/100 messages...") == 2
+
+
+def test_prefetch_forwards_errors_and_stops_early() -> None:
+    def items():
+        yield 1
+        yield 2
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        list(analyzer.prefetch(items(), 1))
+
+    produced = []
+
+    def endless():
+        n = 0
+        while True:
+            produced.append(n)
+            yield n
+            n += 1
+
+    stream = analyzer.prefetch(endless(), 2)
+    assert [next(stream) for _ in range(3)] == [0, 1, 2]
+    stream.close()
+    count = len(produced)
+    time.sleep(0.05)
+    assert len(produced) == count <= 6  # The producer thread has stopped
@@ -0,0 +1,516 @@
+import hashlib
+import imaplib
+import importlib.util
+import re
+import sys
+import threading
+from email.parser import BytesParser
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+
+SCRIPT = Path(__file__).with_name("imapdedup.py")
+
+
+def load_imapdedup():
+    spec = importlib.util.spec_from_file_location("imapdedup_under_test", SCRIPT)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+imapdedup = load_imapdedup()
+
+
+class FakeMailbox:
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.next_uid = 1
+        self.messages: List[dict] = []
+
+    def add(self, headers: bytes, flags=()) -> int:
+        uid = self.next_uid
+        self.next_uid += 1
+        self.messages.append({"uid": uid, "headers": headers, "flags": set(flags)})
+        return uid
+
+
+class FakeImapServer:
+    """Just enough of an IMAP4rev1 server to drive imaplib, in memory."""
+
+    def __init__(self, capabilities: str = "IMAP4rev1 UIDPLUS MOVE"):
+        self.capabilities = capabilities
+        self.mailboxes: Dict[str, FakeMailbox] = {}
+        self.selected: Optional[FakeMailbox] = None
+        self.commands: List[str] = []
+        self.lock = threading.Lock()
+        self.logins = 0
+        self.response_code = ""
+
+    def mailbox(self, name: str) -> FakeMailbox:
+        return self.mailboxes.setdefault(name, FakeMailbox())
+
+    # Helpers
+
+    @staticmethod
+    def uid_set(spec: str, mailbox: FakeMailbox) -> List[dict]:
+        top = mailbox.messages[-1]["uid"] if mailbox.messages else 0
+        wanted = set()
+        for part in spec.split(","):
+            lo, _, hi = part.partition(":")
+            lo_n = top if lo == "*" else int(lo)
+            hi_n = lo_n if not hi else (top if hi == "*" else int(hi))
+            wanted.update(range(min(lo_n, hi_n), max(lo_n, hi_n) + 1))
+        return [m for m in mailbox.messages if m["uid"] in wanted]
+
+    @staticmethod
+    def header_fields(headers: bytes, names: List[str]) -> bytes:
+        names = [n.lower() for n in names]
+        out, keep = [], False
+        for line in headers.splitlines(keepends=True):
+            if line[:1] in (b" ", b"\t"):
+                if keep:
+                    out.append(line)
+                continue
+            keep = line.split(b":", 1)[0].decode().lower() in names
+            if keep:
+                out.append(line)
+        return b"".join(out) + b"\r\n"
+
+    def search(self, query: str) -> List[int]:
+        tokens = query.split()
+        result = []
+        for m in self.selected.messages:
+            ok, i = True, 0
+            while i < len(tokens):
+                token = tokens[i].upper()
+                if token == "DELETED":
+                    ok &= "\\Deleted" in m["flags"]
+                elif token == "UNDELETED":
+                    ok &= "\\Deleted" not in m["flags"]
+                elif token == "KEYWORD":
+                    i += 1
+                    ok &= tokens[i] in m["flags"]
+                elif token == "SENTBEFORE":
+                    i += 1
+                elif token == "UID":
+                    i += 1
+                    ok &= m in self.uid_set(tokens[i], self.selected)
+                i += 1
+            if ok:
+                result.append(m["uid"])
+        return result
+
+    # Protocol
+
+    def handle(self, line: str) -> bytes:
+        self.commands.append(line)
+        tag, command, rest = (line.split(" ", 2) + ["", ""])[:3]
+        command = command.upper()
+        out = b""
+        if command == "CAPABILITY":
+            out += f"* CAPABILITY {self.capabilities}\r\n".encode()
+        elif command in ("SELECT", "EXAMINE"):
+            self.selected = self.mailboxes[rest.strip('"')]
+            out += f"* {len(self.selected.messages)} EXISTS\r\n".encode()
+            out += f"* OK [UIDVALIDITY {self.selected.uidvalidity}] ok\r\n".encode()
+            out += f"* OK [UIDNEXT {self.selected.next_uid}] ok\r\n".encode()
+        elif command == "LIST":
+            for name in self.mailboxes:
+                out += f'* LIST () "/" "{name}"\r\n'.encode()
+        elif command == "CLOSE":
+            self.expunge()
+        elif command == "EXPUNGE":
+            out += self.expunge()
+        elif command == "LOGOUT":
+            out += b"* BYE bye\r\n"
+        elif command == "UID":
+            sub, _, args = rest.partition(" ")
+            out += self.uid_command(sub.upper(), args)
+        code, self.response_code = self.response_code, ""
+        return out + f"{tag} OK {code}done\r\n".encode()
+
+    def expunge(self) -> bytes:
+        out = b""
+        for seq in range(len(self.selected.messages), 0, -1):
+            if "\\Deleted" in self.selected.messages[seq - 1]["flags"]:
+                del self.selected.messages[seq - 1]
+                out += f"* {seq} EXPUNGE\r\n".encode()
+        return out
+
+    def uid_command(self, sub: str, args: str) -> bytes:
+        box = self.selected
+        out = b""
+        if sub == "SEARCH":
+            out += ("* SEARCH " + " ".join(map(str, self.search(args)))).rstrip().encode() + b"\r\n"
+        elif sub == "FETCH":
+            spec, items = args.split(" ", 1)
+            fields = re.search(r"HEADER\.FIELDS \(([^)]*)\)", items)
+            for m in self.uid_set(spec, box):
+                seq = box.messages.index(m) + 1
+                if fields:
+                    literal = self.header_fields(m["headers"], fields.group(1).split())
+                    section = f"BODY[HEADER.FIELDS ({fields.group(1)})]"
+                    out += f"* {seq} FETCH (UID {m['uid']} {section} {{{len(literal)}}}\r\n".encode()
+                    out += literal + b")\r\n"
+                else:
+                    out += f"* {seq} FETCH (UID {m['uid']} FLAGS ({' '.join(sorted(m['flags']))}))\r\n".encode()
+        elif sub == "STORE":
+            spec, mode, flags = args.split(" ", 2)
+            flags = set(flags.strip("()").split())
+            for m in self.uid_set(spec, box):
+                if mode.startswith("+"):
+                    m["flags"] |= flags
+                else:
+                    m["flags"] -= flags
+                seq = box.messages.index(m) + 1
+                out += f"* {seq} FETCH (FLAGS ({' '.join(sorted(m['flags']))}) UID {m['uid']})\r\n".encode()
+        elif sub in ("COPY", "MOVE"):
+            spec, target = args.split(" ", 1)
+            moved = self.uid_set(spec, box)
+            target_box = self.mailboxes[target.strip('"')]
+            new_uids = [target_box.add(m["headers"], m["flags"]) for m in moved]
+            if "UIDPLUS" in self.capabilities and moved:
+                old = ",".join(str(m["uid"]) for m in moved)
+                new = ",".join(map(str, new_uids))
+                code = f"[COPYUID {target_box.uidvalidity} {old} {new}] "
+                if sub == "MOVE":
+                    out += f"* OK {code}copied\r\n".encode()
+                else:
+                    self.response_code = code
+            if sub == "MOVE":
+                for m in moved:
+                    seq = box.messages.index(m) + 1
+                    box.messages.remove(m)
+                    out += f"* {seq} EXPUNGE\r\n".encode()
+        elif sub == "EXPUNGE":
+            keep = {m["uid"] for m in self.uid_set(args, box)}
+            for seq in range(len(box.messages), 0, -1):
+                m = box.messages[seq - 1]
+                if "\\Deleted" in m["flags"] and m["uid"] in keep:
+                    del box.messages[seq - 1]
+                    out += f"* {seq} EXPUNGE\r\n".encode()
+        return out
+
+
+class FakeIMAP4(imaplib.IMAP4):
+    """imaplib client wired to a FakeImapServer instead of a socket."""
+
+    server: FakeImapServer
+
+    def __init__(self, command=None):
+        imaplib.IMAP4.__init__(self)
+
+    def open(self, host=None, port=None, timeout=None):
+        self.host, self.port, self.sock = None, None, None
+        self._out = bytearray(b"* PREAUTH fake ready\r\n")
+        self._in = b""
+        self._selected: Optional[FakeMailbox] = None
+        with self.server.lock:
+            self.server.logins += 1
+
+    def read(self, size):
+        data, self._out[:size] = bytes(self._out[:size]), b""
+        return data
+
+    def readline(self):
+        end = self._out.find(b"\n") + 1
+        data, self._out[:end] = bytes(self._out[:end]), b""
+        return data
+
+    def send(self, data):
+        self._in += data
+        while b"\r\n" in self._in:
+            line, self._in = self._in.split(b"\r\n", 1)
+            # Each connection has its own selected mailbox
+            with self.server.lock:
+                self.server.selected = self._selected
+                self._out += self.server.handle(line.decode())
+                self._selected = self.server.selected
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def fake_server(monkeypatch: pytest.MonkeyPatch) -> FakeImapServer:
+    server = FakeImapServer()
+    FakeIMAP4.server = server
+    monkeypatch.setattr(imaplib, "IMAP4_stream", FakeIMAP4)
+    return server
+
+
+def message(msgid: str, subject: str = "hello", extra: bytes = b"") -> bytes:
+    return (f"Message-ID: <{msgid}>\r\nFrom: a@example.com\r\nTo: b@example.com\r\n"
+            f"Subject: {subject}\r\nDate: Mon, 1 Jan 2024 00:00:00 +0000\r\n").encode() + \
+        extra + b"Received: from somewhere\r\n\tby elsewhere\r\n"
+
+
+def fetched_uids(server: FakeImapServer) -> List[int]:
+    uids: List[int] = []
+    for command in server.commands:
+        if " UID FETCH " in command:
+            spec = command.split(" UID FETCH ", 1)[1].split(" ", 1)[0]
+            uids.extend(m["uid"] for m in server.uid_set(spec, server.selected))
+    return uids
+
+
+def run_dedup(*args: str) -> None:
+    options, mboxes = imapdedup.get_arguments(["-P", "fake", "--no-close", *args])
+    imapdedup.process(options, mboxes)
+
+
+@pytest.mark.parametrize("raw", [
+    b"Subject: plain\r\nFrom: a@b\r\n\r\n",
+    b"subject:   =?utf-8?q?caf=C3=A9?=\r\nSubject: second\r\n\r\n",
+    b"Subject: folded\r\n\tcontinued\r\n more\r\nTo: x\r\n\r\n",
+    b"Subject: 8bit caf\xc3\xa9\r\nFrom: \xff broken\r\n\r\n",
+    b"Message-ID:\r\n <id@host>\r\n\r\n",
+])
+def test_parse_header_fields_matches_email_parser(raw: bytes) -> None:
+    fields = imapdedup.parse_header_fields(raw)
+    parsed = BytesParser().parsebytes(raw)
+
+    for name in ("Subject", "From", "To", "Message-ID", "Cc"):
+        assert imapdedup.str_header(fields, name) == imapdedup.str_header(parsed, name)
+    assert imapdedup.get_message_id(fields, True, True) == imapdedup.get_message_id(parsed, True, True)
+
+
+def test_parse_fetch_response_finds_uid_before_or_after_literal() -> None:
+    data = [
+        (b"1 (UID 10 BODY[HEADER.FIELDS (SUBJECT)] {9}", b"Subject: a"),
+        b")",
+        b"2 (FLAGS (\\Seen))",
+        (b"3 (BODY[HEADER.FIELDS (SUBJECT)] {9}", b"Subject: b"),
+        b" UID 12)",
+    ]
+    assert list(imapdedup.parse_fetch_response(data)) == [(10, b"Subject: a"), (12, b"Subject: b")]
+
+
+def test_dedup_fetches_only_needed_header_fields(fake_server: FakeImapServer,
+                                                 monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(imapdedup, "FETCH_FIRST_BATCH", 7)
+    inbox = fake_server.mailbox("INBOX")
+    archive = fake_server.mailbox("Archive")
+    for i in range(40):
+        inbox.add(message(f"m{i}"))
+    for i in range(0, 40, 3):
+        archive.add(message(f"m{i}"))
+    archive.add(message("new"))
+
+    run_dedup("INBOX", "Archive")
+
+    fetches = [c for c in fake_server.commands if " UID FETCH " in c]
+    assert all("BODY.PEEK[HEADER.FIELDS (FROM TO CC BCC SUBJECT DATE MESSAGE-ID)]" in c
+               for c in fetches)
+    assert len(fetches) > 2  # Several pipelined batches
+    deleted = [m["uid"] for m in archive.messages if "\\Deleted" in m["flags"]]
+    assert len(deleted) == 14
+    assert not any("\\Deleted" in m["flags"] for m in inbox.messages)
+
+
+def test_fetch_falls_back_without_imaplib_internals(fake_server: FakeImapServer,
+                                                    monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(imapdedup, "FETCH_FIRST_BATCH", 4)
+    inbox = fake_server.mailbox("INBOX")
+    for i in range(10):
+        inbox.add(message(f"m{i}"))
+    server = FakeIMAP4()
+    server.select("INBOX")
+    uids = list(range(1, 11))
+    pipelined = list(imapdedup.fetch_msg_headers(server, uids))
+
+    # As if a future imaplib renamed one of them
+    monkeypatch.setattr(imapdedup.FetchPipeline, "PRIVATE_METHODS",
+                        ("_command", "_renamed_command_complete", "_untagged_response"))
+    assert imapdedup.FetchPipeline(server, 3).depth == 1
+    assert list(imapdedup.fetch_msg_headers(server, uids)) == pipelined
+    assert [uid for uid, _ in pipelined] == uids
+
+
+def test_checksum_mode_uses_header_fields(fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    inbox.add(message("a", "same"))
+    inbox.add(message("b", "same"))
+    inbox.add(message("c", "different"))
+
+    run_dedup("-c", "INBOX")
+
+    assert [("\\Deleted" in m["flags"]) for m in inbox.messages] == [False, True, False]
+
+
+def test_cache_fetches_only_new_messages(fake_server: FakeImapServer, tmp_path: Path) -> None:
+    cache = str(tmp_path / "ids.sqlite")
+    inbox = fake_server.mailbox("INBOX")
+    for i in range(5):
+        inbox.add(message(f"m{i}"))
+
+    run_dedup("-n", "-C", cache, "INBOX")
+    assert fetched_uids(fake_server) == [1, 2, 3, 4, 5]
+
+    fake_server.commands.clear()
+    inbox.add(message("m1"))
+    run_dedup("-C", cache, "INBOX")
+
+    assert fetched_uids(fake_server) == [6]
+    assert [m["uid"] for m in inbox.messages if "\\Deleted" in m["flags"]] == [6]
+
+
+def test_cache_discarded_when_uidvalidity_changes(fake_server: FakeImapServer,
+                                                  tmp_path: Path) -> None:
+    cache = str(tmp_path / "ids.sqlite")
+    inbox = fake_server.mailbox("INBOX")
+    inbox.add(message("a"))
+    inbox.add(message("b"))
+    run_dedup("-n", "-C", cache, "INBOX")
+
+    # The mailbox is recreated: same UIDs, different messages
+    inbox.uidvalidity = 2
+    inbox.messages[1]["headers"] = message("a")
+    fake_server.commands.clear()
+    run_dedup("-C", cache, "INBOX")
+
+    assert fetched_uids(fake_server) == [1, 2]
+    assert [("\\Deleted" in m["flags"]) for m in inbox.messages] == [False, True]
+
+
+def test_parallel_scan_keeps_mailbox_order(fake_server: FakeImapServer) -> None:
+    boxes = [fake_server.mailbox(f"box{i}") for i in range(6)]
+    for i, box in enumerate(boxes):
+        for j in range(10):
+            box.add(message(f"m{(i + j) % 15}"))
+
+    run_dedup("-j", "3", "-R", *[f"box{i}" for i in range(6)])
+
+    assert 1 < fake_server.logins <= 4  # The main connection and up to three scanners
+    # Reversed order: the last mailbox keeps everything, earlier ones lose
+    # whatever a later mailbox already holds.
+    seen = set()
+    for box in reversed(boxes):
+        ids = [re.search(rb"<(.*)>", m["headers"]).group(1) for m in box.messages]
+        deleted = ["\\Deleted" in m["flags"] for m in box.messages]
+        assert deleted == [i in seen for i in ids]
+        seen.update(ids)
+
+
+def test_uid_sets_are_compact_and_bounded() -> None:
+    uids = [9, 1, 2, 3, 5, 7, 8, 3]
+    assert imapdedup.uid_sequence_set(uids) == "1:3,5,7:9"
+    assert imapdedup.parse_sequence_set(b"1:3,5,9:7") == [1, 2, 3, 5, 7, 8, 9]
+
+    spread = list(range(1, 20_000, 2))
+    sets = list(imapdedup.iter_uid_sets(spread, max_length=100))
+    assert all(len(s) <= 100 for s in sets)
+    assert [uid for s in sets for uid in imapdedup.parse_sequence_set(s)] == spread
+
+
+def test_duplicates_stored_in_ranges_without_confirming_searches(
+        fake_server: FakeImapServer) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    archive = fake_server.mailbox("Archive")
+    for i in range(50):
+        inbox.add(message(f"m{i}"))
+        archive.add(message(f"m{i}" if i != 25 else "other"))
+
+    run_dedup("INBOX", "Archive")
+
+    stores = [c for c in fake_server.commands if " UID STORE " in c]
+    assert [c.split(" ", 3)[3] for c in stores] == ["1:25,27:50 +FLAGS (\\Deleted)"]
+    after = fake_server.commands[fake_server.commands.index(stores[0]) + 1:]
+    assert not any(" SEARCH " in c for c in after)
+
+
+@pytest.mark.parametrize("capabilities, expected", [
+    ("IMAP4rev1 UIDPLUS MOVE", ["MOVE"]),
+    ("IMAP4rev1 UIDPLUS", ["COPY", "STORE", "EXPUNGE"]),
+    ("IMAP4rev1", ["COPY", "STORE"]),
+])
+def test_copy_uses_move_or_uidplus_when_offered(fake_server: FakeImapServer,
+                                                capabilities: str,
+                                                expected: List[str]) -> None:
+    fake_server.capabilities = capabilities
+    inbox = fake_server.mailbox("INBOX")
+    fake_server.mailbox("Dups")
+    for msgid in ("a", "b", "a", "a", "c"):
+        inbox.add(message(msgid))
+
+    run_dedup("--move", "-y", "Dups", "INBOX")
+
+    mutations = [c.split()[2] for c in fake_server.commands
+                 if c.split()[1:2] == ["UID"] and c.split()[2] not in ("SEARCH", "FETCH")]
+    assert mutations == expected
+    # Without MOVE or UIDPLUS they are only marked deleted, as without --move
+    kept = [1, 2, 3, 4, 5] if expected == ["COPY", "STORE"] else [1, 2, 5]
+    assert [m["uid"] for m in inbox.messages] == kept
+    assert len(fake_server.mailboxes["Dups"].messages) == 2
+
+
+def test_copy_without_move_leaves_earlier_mailboxes_recoverable(
+        fake_server: FakeImapServer, capsys: pytest.CaptureFixture) -> None:
+    inbox = fake_server.mailbox("INBOX")
+    archive = fake_server.mailbox("Archive")
+    fake_server.mailbox("Dups")
+    for msgid in ("a", "a", "b"):
+        inbox.add(message(msgid))
+        archive.add(message(msgid))
+
+    options, mboxes = imapdedup.get_arguments(["-P", "fake", "-y", "Dups", "INBOX", "Archive"])
+    imapdedup.process(options, mboxes)
+
+    assert not any(" MOVE " in c or " EXPUNGE" in c for c in fake_server.commands)
+    # CLOSE only expunges the last mailbox selected, as it always has
+    assert [(m["uid"], m["flags"]) for m in inbox.messages] == [
+        (1, set()), (2, {"\\Deleted"}), (3, set())]
+    assert [m["uid"] for m in archive.messages] == []
+    out = capsys.readouterr().out
+    assert "1 messages copied to 'Dups'." in out and "3 messages copied to 'Dups'." in out
+
+
+def test_copied_count_comes_from_copyuid(fake_server: FakeImapServer,
+                                         capsys: pytest.CaptureFixture) -> None:
+    fake_server.capabilities = "IMAP4rev1 UIDPLUS"
+    inbox = fake_server.mailbox("INBOX")
+    fake_server.mailbox("Dups")
+    for msgid in ("a", "a", "a", "a"):
+        inbox.add(message(msgid))
+
+    real_handle = fake_server.handle
+
+    def handle(line: str) -> bytes:
+        if " UID COPY " in line:
+            # Another client expunges a duplicate just before the COPY
+            del fake_server.selected.messages[2]
+        return real_handle(line)
+
+    fake_server.handle = handle  # type: ignore[method-assign]
+    run_dedup("-y", "Dups", "INBOX")
+
+    out = capsys.readouterr().out
+    assert "2 messages copied to 'Dups'." in out
+    assert len(fake_server.mailboxes["Dups"].messages) == 2
+
+
+def test_checksum_digest_modes() -> None:
+    fields = imapdedup.parse_header_fields(message("x@y", "subject"))
+    data = b"".join(f"{name}:{imapdedup.str_header(fields, name)}".encode()
+                    for name in ("From", "To", "Subject", "Date", "Cc", "Bcc", "Message-ID"))
+    legacy = "|".join(hashlib.new(name, data).hexdigest() for name in ("md5", "sha256", "sha3_256"))
+
+    assert imapdedup.get_message_id(fields, True, True, "legacy") == legacy
+    assert imapdedup.get_message_id(fields, True, True) == hashlib.blake2b(data, digest_size=16).digest()
+
+
+def test_cached_checksums_match_fresh_ones(fake_server: FakeImapServer, tmp_path: Path) -> None:
+    cache = str(tmp_path / "ids.sqlite")
+    inbox = fake_server.mailbox("INBOX")
+    inbox.add(message("a", "same"))
+    run_dedup("-n", "-c", "-C", cache, "INBOX")
+
+    inbox.add(message("b", "same"))
+    run_dedup("-c", "-C", cache, "INBOX")
+
+    assert [("\\Deleted" in m["flags"]) for m in inbox.messages] == [False, True]